@@ -1,58 +1,81 @@
-import networkx as nx
-import random
+import numpy as np
 import subprocess
 import os
 import pickle
 
-def generate_erdos_renyi_graph(num_nodes, prob, infected_ratio):
-    G = nx.erdos_renyi_graph(num_nodes, prob, directed=True)
+from lt_graph_io import BINARY_EXTENSION, write_graph
+from lt_weights import normalize_incoming_weights
 
-    weights = {}
-    for node in G.nodes():
-        incoming_edges = list(G.in_edges(node))
-        if incoming_edges:
-            raw_weights = [random.random() for _ in incoming_edges]
-            total_raw_weight = sum(raw_weights)*1.1
-            
-            normalized_weights = [w / total_raw_weight for w in raw_weights]
-            
-            for edge, weight in zip(incoming_edges, normalized_weights):
-                weights[edge] = weight
+def _gnp_edges_skip(num_nodes, prob, rng, batch_size):
+    # Geometric skip sampling over the n(n-1) ordered pairs (u, v), u != v: the gap to the
+    # next sampled pair is Geometric(prob), so the work is proportional to the edge count.
+    num_pairs = num_nodes * (num_nodes - 1)
+    sources, targets = [], []
+    position = -1
+    while position < num_pairs:
+        expected = int((num_pairs - position) * prob * 1.1) + 64
+        positions = position + np.cumsum(rng.geometric(prob, size=min(expected, batch_size)), dtype=np.int64)
+        position = positions[-1]
+        positions = positions[positions < num_pairs]
+        u, r = np.divmod(positions, num_nodes - 1)
+        # Pair index r of row u skips the diagonal
+        sources.append(u.astype(np.int32))
+        targets.append((r + (r >= u)).astype(np.int32))
+    return np.concatenate(sources), np.concatenate(targets)
 
-    infected_nodes = random.sample(list(G.nodes()), max(1, int(infected_ratio * num_nodes)))
-    
-    ni = input("num instances (eg 50) = ")
-    vr = input("vaccine ratio (eg 0.1) = ")
-    output_filename = "LT_ERG_" + str(num_nodes) + "_" + str(int(num_nodes*float(vr))) + "_" + str(ni) + ".txt"
-    with open(output_filename, "w") as file:
-        for node in infected_nodes:
-            file.write(f"INFECTED_NODE {node}\n")
-        
-        for n in G.nodes():
-            file.write(f"NODE {n}\n")
-        for (u, v) in G.edges():
-            if (u, v) in weights:
-                file.write(f"EDGE {u} {v} {weights[(u, v)]:.5f}\n")
-        file.write(f"NUM_INSTANCES {ni}\nNUM_VACCINES {(int(num_nodes*float(vr)))}\n")
+def _gnp_edges_dense(num_nodes, prob, rng, batch_size):
+    # Bernoulli masks over blocks of rows, about batch_size pairs at a time
+    rows_per_block = max(1, batch_size // num_nodes)
+    sources, targets = [], []
+    for start in range(0, num_nodes, rows_per_block):
+        stop = min(start + rows_per_block, num_nodes)
+        hits = rng.random((stop - start, num_nodes)) < prob
+        hits[np.arange(stop - start), np.arange(start, stop)] = False
+        rows, cols = np.nonzero(hits)
+        sources.append((rows + start).astype(np.int32))
+        targets.append(cols.astype(np.int32))
+    return np.concatenate(sources), np.concatenate(targets)
+
+def sample_gnp_edges(num_nodes, prob, rng=None, batch_size=1 << 22, sparse_threshold=0.05):
+    # Directed G(n, p) without self loops as (sources, targets) arrays sorted by (u, v)
+    rng = np.random.default_rng() if rng is None else rng
+    if num_nodes < 2 or prob <= 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    if prob < sparse_threshold:
+        return _gnp_edges_skip(num_nodes, prob, rng, batch_size)
+    return _gnp_edges_dense(num_nodes, min(prob, 1.0), rng, batch_size)
+
+def generate_erdos_renyi_graph(num_nodes, prob, infected_ratio, num_instances, vaccine_ratio,
+                               binary=False, output_filename=None, rng=None):
+    # Every random draw goes through rng, so a seeded rng reproduces the graph exactly
+    rng = np.random.default_rng() if rng is None else rng
+    sources, targets = sample_gnp_edges(num_nodes, prob, rng)
+    weights = normalize_incoming_weights(targets, rng)
+
+    infected_nodes = rng.choice(num_nodes, max(1, int(infected_ratio * num_nodes)), replace=False)
+
+    num_vaccines = int(num_nodes * float(vaccine_ratio))
+    if output_filename is None:
+        output_filename = "LT_ERG_" + str(num_nodes) + "_" + str(num_vaccines) + "_" + str(num_instances) + (BINARY_EXTENSION if binary else ".txt")
+    write_graph(output_filename, np.arange(num_nodes), sources, targets, weights, infected_nodes, num_instances, num_vaccines)
 
     # with open('ERG_graph.pkl', 'wb') as pickle_file:
-    #     pickle.dump((G, weights, infected_nodes), pickle_file)
+    #     pickle.dump((sources, targets, weights, infected_nodes), pickle_file)
     
-    return G, weights, infected_nodes
+    return sources, targets, weights, infected_nodes
 
-def make_dotfile(G, weights, infected_nodes, filename):
+def make_dotfile(num_nodes, sources, targets, weights, infected_nodes, filename):
     output = 'digraph G {\n'
     output += 'rankdir=LR;\nsize="8,5";\nratio="compress";\n'
     
-    for node in G.nodes():
+    for node in range(num_nodes):
         if node in infected_nodes:
             output += f'{node} [label="{node}", style=filled, fillcolor=lightcoral];\n'
         else:
             output += f'{node} [label="{node}"];\n'
     
-    for (u, v) in G.edges():
-        if (u, v) in weights:
-            output += f'{u} -> {v} [label="{weights[(u, v)]:.2f}"];\n'
+    for u, v, w in zip(sources.tolist(), targets.tolist(), weights.tolist()):
+        output += f'{u} -> {v} [label="{w:.2f}"];\n'
     
     output += '}'
     
@@ -66,7 +89,11 @@ def make_dotfile(G, weights, infected_nodes, filename):
 
 if __name__ == "__main__":
     nn = input("num nodes = ")
+    p = input("edge probability (eg 0.3) = ")
     ir = input("infected ratio (eg 0.1) = ")
-    G, weights, infected_nodes = generate_erdos_renyi_graph(num_nodes=int(nn), prob=0.3, infected_ratio=float(ir))
+    ni = input("num instances (eg 50) = ")
+    vr = input("vaccine ratio (eg 0.1) = ")
+    sources, targets, weights, infected_nodes = generate_erdos_renyi_graph(num_nodes=int(nn), prob=float(p), infected_ratio=float(ir),
+                                                                           num_instances=int(ni), vaccine_ratio=float(vr))
     
-    # make_dotfile(G, weights, infected_nodes, "LT_erdos_renyi_graph")
+    # make_dotfile(int(nn), sources, targets, weights, infected_nodes, "LT_erdos_renyi_graph")
@@ -1,98 +1,248 @@
+import os
+import warnings
+
 import numpy as np 
-import networkx as nx
-import random
 import matplotlib.pyplot as plt
 import pickle
+from scipy.spatial import ConvexHull, QhullError, cKDTree
+from scipy.spatial.distance import pdist
+
+from lt_graph_io import BINARY_EXTENSION, write_graph, write_graph_chunks
+from lt_weights import normalize_incoming_weights, scale_incoming_weights
 
-def generate_gaussian_points(num_nodes, num_centers, box_size=(1, 1)):
-    centers = np.random.uniform(0, box_size[0], (num_centers, 2))
+def generate_gaussian_points(num_nodes, num_centers, box_size=(1, 1), rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    centers = rng.uniform(0, box_size[0], (num_centers, 2))
     
     max_sigma = min(box_size) / 10
-    sigmas = np.random.uniform(0.05 * max_sigma, max_sigma, num_centers)
+    sigmas = rng.uniform(0.05 * max_sigma, max_sigma, num_centers)
     
     sigma_sum = sum(sigmas)
     points = []
 
     for i in range(num_centers):
         num_points = int(num_nodes * sigmas[i] / sigma_sum)
-        sampled_points = np.random.normal(loc=centers[i], scale=sigmas[i], size=(num_points, 2))
+        sampled_points = rng.normal(loc=centers[i], scale=sigmas[i], size=(num_points, 2))
         
         sampled_points = np.clip(sampled_points, [0, 0], box_size)
-        points.extend(sampled_points)
+        points.append(sampled_points)
 
-    while len(points) < num_nodes:
-        points.append(np.random.uniform(0, box_size[0], 2))
+    num_sampled = sum(len(sampled_points) for sampled_points in points)
+    points.append(rng.uniform(0, box_size[0], (num_nodes - num_sampled, 2)))
     
-    return np.array(points), centers, sigmas
+    return np.concatenate(points), centers, sigmas
 
 
 def waxman_edge_probability(d, L, alpha, beta):
     return alpha * np.exp(-d / (beta * L))
 
-def generate_waxman_graph_gaussian(num_nodes, num_centers, alpha, beta, infected_ratio):
-    points, centers, _ = generate_gaussian_points(num_nodes, num_centers)
-    
-    G = nx.Graph()
-    for i in range(num_nodes):
-        G.add_node(i)
-
-    L = np.max([np.linalg.norm(points[i] - points[j]) for i in range(num_nodes) for j in range(i)])
-
-    for i in range(num_nodes):
-        for j in range(i + 1, num_nodes):
-            d = np.linalg.norm(points[i] - points[j])
-            prob = waxman_edge_probability(d, L, alpha, beta)
-            if random.random() < prob:
-                G.add_edge(i, j)
-
-    directed_G = nx.DiGraph()
-    directed_G.add_nodes_from(G.nodes())
-    for u, v in G.edges():
-        directed_G.add_edge(u, v)
-        directed_G.add_edge(v, u)
-
-    weights = {}
-    for node in directed_G.nodes():
-        incoming_edges = list(directed_G.in_edges(node))
-        if incoming_edges:
-            raw_weights = [random.random() for _ in incoming_edges]
-            total_raw_weight = sum(raw_weights) * 1.1
-            
-            normalized_weights = [w / total_raw_weight for w in raw_weights]
-            for edge, weight in zip(incoming_edges, normalized_weights):
-                weights[edge] = weight
-
-    infected_nodes = random.sample(list(directed_G.nodes()), max(1, int(infected_ratio * num_nodes)))
-    
-    ni = input("num instances (eg 50) = ")
-    vr = input("vaccine ratio (eg 0.1) = ")
+def convex_hull_diameter(points):
+    # The farthest pair of points always lies on the convex hull, so only the hull
+    # vertices need to be compared instead of all O(n^2) pairs.
+    if len(points) < 2:
+        return 0.0
+    try:
+        candidates = points[ConvexHull(points).vertices]
+    except (QhullError, ValueError):
+        # Degenerate input (too few or collinear points): the extremes along each
+        # axis contain the farthest pair.
+        extremes = np.concatenate([points.argmin(axis=0), points.argmax(axis=0)])
+        candidates = points[np.unique(extremes)]
+    if len(candidates) < 2:
+        return 0.0
+    return float(np.max(pdist(candidates)))
 
-    output_filename = "LT_waxman_gaussian_" + str(num_nodes) + "_" + str(int(num_nodes*float(vr))) + "_" + str(ni) + ".txt"
+def _waxman_edge_tiles(points, L, alpha, beta, block_size, rng):
+    # Yields the sampled pairs i < j of one (block_size x block_size) tile at a time
+    num_nodes = len(points)
+    for i0 in range(0, num_nodes, block_size):
+        i1 = min(i0 + block_size, num_nodes)
+        for j0 in range(i0, num_nodes, block_size):
+            j1 = min(j0 + block_size, num_nodes)
+            dx = points[i0:i1, 0, None] - points[None, j0:j1, 0]
+            dy = points[i0:i1, 1, None] - points[None, j0:j1, 1]
+            prob = waxman_edge_probability(np.hypot(dx, dy), L, alpha, beta)
+            hits = rng.random(prob.shape) < prob
+            if i0 == j0:
+                hits = np.triu(hits, k=1)
+            rows, cols = np.nonzero(hits)
+            yield (rows + i0).astype(np.int32), (cols + j0).astype(np.int32)
 
-    with open(output_filename, "w") as file:
-        for node in infected_nodes:
-            file.write(f"INFECTED_NODE {node}\n")
-        
-        for n in G.nodes():
-            file.write(f"NODE {n}\n")
-        for (u, v) in directed_G.edges():
-            if (u, v) in weights:
-                file.write(f"EDGE {u} {v} {weights[(u, v)]:.5f}\n")
-        file.write(f"NUM_INSTANCES {ni}\nNUM_VACCINES {(int(num_nodes*float(vr)))}\n")
+def waxman_edges_blocked(points, L, alpha, beta, block_size=1024, rng=None):
+    # Samples every unordered pair i < j with probability waxman_edge_probability(d, L, alpha, beta),
+    # one (block_size x block_size) tile of pairs at a time so memory stays bounded.
+    rng = np.random.default_rng() if rng is None else rng
+    num_nodes = len(points)
+    if num_nodes < 2 or L <= 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+
+    sources, targets = [], []
+    for rows, cols in _waxman_edge_tiles(points, L, alpha, beta, block_size, rng):
+        sources.append(rows)
+        targets.append(cols)
+    return np.concatenate(sources), np.concatenate(targets)
+
+def waxman_cutoff_distance(num_nodes, L, alpha, beta, max_dropped_mass):
+    # Every pair farther apart than r has probability below alpha * exp(-r / (beta * L)),
+    # so the expected number of edges lost by ignoring those pairs is at most
+    # num_pairs * alpha * exp(-r / (beta * L)). Solve that for r = max_dropped_mass.
+    num_pairs = num_nodes * (num_nodes - 1) / 2
+    if num_pairs == 0 or alpha * num_pairs <= max_dropped_mass:
+        return 0.0
+    cutoff = beta * L * np.log(alpha * num_pairs / max_dropped_mass)
+    # No pair is farther apart than L, so a larger cutoff keeps every pair anyway
+    return float(min(cutoff, L))
+
+def waxman_chunks(points, tree, cutoff, max_pairs):
+    # Contiguous point ranges whose range queries return at most max_pairs pairs in total
+    # (a single point may return more), from the number of neighbours of every point
+    # within cutoff, so clustered points get smaller chunks than sparse ones
+    counts = tree.query_ball_point(points, cutoff, return_length=True)
+    ends = np.cumsum(counts)
+    starts, start = [], 0
+    while start < len(points):
+        starts.append(start)
+        # First point past the budget of this chunk, and at least one point per chunk
+        start = max(start + 1, int(np.searchsorted(ends, ends[start] - counts[start] + max_pairs, side='right')))
+    return list(zip(starts, starts[1:] + [len(points)]))
+
+def stream_waxman_edges_truncated(points, L, alpha, beta, cutoff, edges_filename, max_pairs=1 << 22, rng=None):
+    # Only pairs within `cutoff` of each other are enumerated (KD-tree range queries, one
+    # chunk of points at a time, at most max_pairs candidate pairs per chunk) and every
+    # sampled edge (i, j), i < j, is appended to edges_filename as two int32 values
+    # instead of being kept in memory.
+    rng = np.random.default_rng() if rng is None else rng
+    num_nodes = len(points)
+    num_edges = 0
+
+    with open(edges_filename, "wb") as file:
+        if cutoff >= L:
+            # The cutoff keeps every pair, so range queries would only add overhead to the
+            # O(n^2) enumeration; sample the pairs in tiles as the dense generator does
+            warnings.warn(f"cutoff {cutoff:.5f} >= L = {L:.5f}, every pair is sampled (dense path)")
+            if num_nodes >= 2 and L > 0:
+                block_size = max(1, int(np.sqrt(max_pairs)))
+                for rows, cols in _waxman_edge_tiles(points, L, alpha, beta, block_size, rng):
+                    np.column_stack([rows, cols]).tofile(file)
+                    num_edges += len(rows)
+            return num_edges
+
+        tree = cKDTree(points)
+        for start, stop in waxman_chunks(points, tree, cutoff, max_pairs):
+            pairs = cKDTree(points[start:stop]).sparse_distance_matrix(tree, cutoff, output_type='ndarray')
+            i = pairs['i'] + start
+            j = pairs['j']
+            upper = i < j
+            i, j, d = i[upper], j[upper], pairs['v'][upper]
+
+            hits = rng.random(len(d)) < waxman_edge_probability(d, L, alpha, beta)
+            edges = np.empty((int(hits.sum()), 2), dtype=np.int32)
+            edges[:, 0] = i[hits]
+            edges[:, 1] = j[hits]
+            edges.tofile(file)
+            num_edges += len(edges)
+
+    return num_edges
+
+def load_streamed_edges(edges_filename):
+    # (num_edges, 2) read-only view of a file written by stream_waxman_edges_truncated
+    if os.path.getsize(edges_filename) == 0:
+        return np.empty((0, 2), dtype=np.int32)
+    return np.memmap(edges_filename, dtype=np.int32, mode='r').reshape(-1, 2)
+
+def _directed_edge_chunks(edges, seed, chunk_size):
+    # Both directions of chunk_size streamed edges at a time with their raw weights, drawn
+    # from a generator seeded by (seed, chunk) so every pass sees the same ones
+    for index, start in enumerate(range(0, len(edges), chunk_size)):
+        pairs = np.asarray(edges[start:start + chunk_size])
+        sources = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        targets = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        yield sources, targets, np.random.default_rng([seed, index]).random(len(sources))
+
+def write_truncated_waxman_graph(output_filename, num_nodes, edges_filename, infected_nodes, num_instances,
+                                 num_vaccines, chunk_size=1 << 20, rng=None):
+    # Turns the undirected edges of stream_waxman_edges_truncated into a graph file (text or
+    # .ltg) without loading them: a first pass sums the raw incoming weights and counts the
+    # outgoing edges of every node, a second one normalizes the weights like
+    # normalize_incoming_weights and streams the directed edges into the file. Returns the
+    # number of directed edges.
+    rng = np.random.default_rng() if rng is None else rng
+    edges = load_streamed_edges(edges_filename)
+    seed = int(rng.integers(2**63))
+    raw_sums = np.zeros(num_nodes)
+    out_degrees = np.zeros(num_nodes, dtype=np.int64)
+    for sources, targets, raw_weights in _directed_edge_chunks(edges, seed, chunk_size):
+        raw_sums += np.bincount(targets, weights=raw_weights, minlength=num_nodes)
+        out_degrees += np.bincount(sources, minlength=num_nodes)
+
+    chunks = ((sources, targets, scale_incoming_weights(raw_weights, targets, raw_sums))
+              for sources, targets, raw_weights in _directed_edge_chunks(edges, seed, chunk_size))
+    write_graph_chunks(output_filename, np.arange(num_nodes), chunks, out_degrees, infected_nodes, num_instances,
+                       num_vaccines)
+    return int(out_degrees.sum())
+
+def generate_waxman_graph_gaussian_truncated(num_nodes, num_centers, alpha, beta, infected_ratio, num_instances,
+                                             vaccine_ratio, max_dropped_mass=1.0, binary=False, output_filename=None,
+                                             edges_filename=None, max_pairs=1 << 22, rng=None):
+    # generate_waxman_graph_gaussian for graphs too large for memory: pairs farther apart
+    # than waxman_cutoff_distance are never enumerated and the edges go through a file of
+    # undirected pairs (edges_filename, removed afterwards unless given) on their way to
+    # the graph file
+    rng = np.random.default_rng() if rng is None else rng
+    points, centers, _ = generate_gaussian_points(num_nodes, num_centers, rng=rng)
+
+    L = convex_hull_diameter(points)
+    cutoff = waxman_cutoff_distance(num_nodes, L, alpha, beta, max_dropped_mass)
+    num_vaccines = int(num_nodes * float(vaccine_ratio))
+    if output_filename is None:
+        output_filename = "LT_waxman_gaussian_" + str(num_nodes) + "_" + str(num_vaccines) + "_" + str(num_instances) + (BINARY_EXTENSION if binary else ".txt")
+    keep_edges = edges_filename is not None
+    edges_filename = output_filename + ".pairs" if edges_filename is None else edges_filename
+    stream_waxman_edges_truncated(points, L, alpha, beta, cutoff, edges_filename, max_pairs, rng)
+
+    infected_nodes = rng.choice(num_nodes, max(1, int(infected_ratio * num_nodes)), replace=False)
+    num_edges = write_truncated_waxman_graph(output_filename, num_nodes, edges_filename, infected_nodes, num_instances,
+                                             num_vaccines, rng=rng)
+    if not keep_edges:
+        os.remove(edges_filename)
+
+    print(f"L = {L:.5f}, cutoff = {cutoff:.5f} (expected dropped edges <= {max_dropped_mass})")
+    print(num_edges, "directed edges, output in", output_filename)
+    return output_filename, points, centers, infected_nodes
+
+def generate_waxman_graph_gaussian(num_nodes, num_centers, alpha, beta, infected_ratio, num_instances, vaccine_ratio,
+                                   binary=False, output_filename=None, rng=None):
+    # Every random draw goes through rng, so a seeded rng reproduces the graph exactly
+    rng = np.random.default_rng() if rng is None else rng
+    points, centers, _ = generate_gaussian_points(num_nodes, num_centers, rng=rng)
+
+    L = convex_hull_diameter(points)
+    sources, targets = waxman_edges_blocked(points, L, alpha, beta, rng=rng)
+
+    # Every undirected Waxman edge becomes a pair of directed edges
+    sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    weights = normalize_incoming_weights(targets, rng)
+
+    infected_nodes = rng.choice(num_nodes, max(1, int(infected_ratio * num_nodes)), replace=False)
+
+    num_vaccines = int(num_nodes * float(vaccine_ratio))
+    if output_filename is None:
+        output_filename = "LT_waxman_gaussian_" + str(num_nodes) + "_" + str(num_vaccines) + "_" + str(num_instances) + (BINARY_EXTENSION if binary else ".txt")
+    write_graph(output_filename, np.arange(num_nodes), sources, targets, weights, infected_nodes, num_instances, num_vaccines)
     
     # with open('waxman_gaussian_graph.pkl', 'wb') as pickle_file:
     #     pickle.dump((directed_G, weights, infected_nodes), pickle_file)
     print("output in", output_filename)
-    return directed_G, weights, infected_nodes, points, centers
+    return sources, targets, weights, infected_nodes, points, centers
 
 
-def plot_waxman_graph(G, pos, centers, infected_nodes, weights):
+def plot_waxman_graph(points, centers, infected_nodes):
     plt.figure(figsize=(8, 8))
 
-    node_colors = ['lightcoral' if node in infected_nodes else 'skyblue' for node in G.nodes()]
-    nx.draw_networkx_nodes(G, pos, node_color=node_colors, node_size=5, alpha=0.8)
-
-    # nx.draw_networkx_edges(G, pos, edgelist=G.edges(), arrowstyle='->', arrowsize=1)
+    infected = np.zeros(len(points), dtype=bool)
+    infected[infected_nodes] = True
+    plt.scatter(points[~infected, 0], points[~infected, 1], color='skyblue', s=5, alpha=0.8)
+    plt.scatter(points[infected, 0], points[infected, 1], color='lightcoral', s=5, alpha=0.8)
 
     center_colors = ['green' for _ in centers]
     plt.scatter(centers[:, 0], centers[:, 1], color=center_colors, s=10)
@@ -110,12 +260,33 @@ if __name__ == "__main__":
     nc = input("num_centers = ")
     nn = input("num nodes = ")
     ir = input("infected ratio (eg 0.1) = ")
-    G, weights, infected_nodes, points, centers = generate_waxman_graph_gaussian(
-        num_nodes=int(nn), 
-        num_centers=int(nc),
-        alpha=float(a), 
-        beta=float(b), 
-        infected_ratio=float(ir)
-    )
-
-    plot_waxman_graph(G, {i: points[i] for i in G.nodes()}, centers, infected_nodes, weights)
+    ni = input("num instances (eg 50) = ")
+    vr = input("vaccine ratio (eg 0.1) = ")
+    # Large graphs: leave out the pairs too far apart to matter and stream the edges to disk
+    truncated = input("truncate distant pairs (y/n, default n) = ").strip().lower() == "y"
+    if truncated:
+        dm = input("max expected dropped edges (eg 1.0) = ")
+        binary = input(f"write a {BINARY_EXTENSION} binary graph (y/n, default n) = ").strip().lower() == "y"
+        _, points, centers, infected_nodes = generate_waxman_graph_gaussian_truncated(
+            num_nodes=int(nn),
+            num_centers=int(nc),
+            alpha=float(a),
+            beta=float(b),
+            infected_ratio=float(ir),
+            num_instances=int(ni),
+            vaccine_ratio=float(vr),
+            max_dropped_mass=float(dm),
+            binary=binary
+        )
+    else:
+        sources, targets, weights, infected_nodes, points, centers = generate_waxman_graph_gaussian(
+            num_nodes=int(nn), 
+            num_centers=int(nc),
+            alpha=float(a), 
+            beta=float(b), 
+            infected_ratio=float(ir),
+            num_instances=int(ni),
+            vaccine_ratio=float(vr)
+        )
+
+    plot_waxman_graph(points, centers, infected_nodes)
@@ -0,0 +1,116 @@
+import argparse
+import time
+
+import numpy as np
+
+from LT_generate_ERG import sample_gnp_edges
+from LT_generate_waxman_gaussian import convex_hull_diameter, generate_gaussian_points, waxman_edges_blocked
+from greedy_vaccination import build_infected_forest, count_infected_in_forest
+from live_edge import sample_live_edge_parents
+from lt_weights import normalize_incoming_weights
+from topology_eval import count_infected
+
+# Times scoring vaccination sets with topology_eval.count_infected (from the parent matrix)
+# and with greedy_vaccination.count_infected_in_forest (on an infected forest built once
+# for the topologies and seeds) against the per-topology get_infected loop the LP scripts
+# used, on live-edge topologies sampled from the generators and on synthetic deep forests.
+# The dicts get_infected walks are built before its timer starts, as the scripts had them
+# from loading, and so is the forest. All three must give the same counts. count_infected
+# makes a pass over the whole parent matrix, so it cannot beat a loop that only touches a
+# few infected pairs; count_infected_in_forest is the one for scoring many sets.
+
+
+def get_infected(topology, infected, vaccinated):
+    # The BFS of ILP.py, LP_TKR.py and LP_IRP.py, kept as the reference
+    visited = set(vaccinated)
+    _infected = infected.copy()
+    count = 0
+    for _i in infected:
+        visited.add(_i)
+        count += 1
+    while len(_infected) > 0:
+        _index = _infected.pop(0)
+        if _index not in topology:
+            continue
+        for neighbor in topology[_index]:
+            if neighbor not in visited:
+                visited.add(neighbor)
+                _infected.append(neighbor)
+                count += 1
+    return count
+
+def topology_dicts(parents):
+    graphs = []
+    for row in parents:
+        children = np.flatnonzero(row >= 0)
+        graph = {}
+        for parent, child in zip(row[children].tolist(), children.tolist()):
+            graph.setdefault(parent, []).append(child)
+        graphs.append(graph)
+    return graphs
+
+def erg_parents(num_nodes, prob, num_instances, rng):
+    sources, targets = sample_gnp_edges(num_nodes, prob, rng)
+    return sample_live_edge_parents(num_nodes, sources, targets, normalize_incoming_weights(targets, rng), num_instances, rng)
+
+def waxman_parents(num_nodes, num_instances, rng, num_centers=10, alpha=0.1, beta=0.9):
+    points, _, _ = generate_gaussian_points(num_nodes, num_centers, rng=rng)
+    sources, targets = waxman_edges_blocked(points, convex_hull_diameter(points), alpha, beta, rng=rng)
+    sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    return sample_live_edge_parents(num_nodes, sources, targets, normalize_incoming_weights(targets, rng), num_instances, rng)
+
+def deep_parents(num_nodes, num_instances, rng, reach=3, root_prob=0.02):
+    # Every node hangs below one of the `reach` nodes before it, so the trees are long chains
+    parents = np.arange(num_nodes) - rng.integers(1, reach + 1, (num_instances, num_nodes))
+    parents[rng.random((num_instances, num_nodes)) < root_prob] = -1
+    return np.maximum(parents, -1).astype(np.int32)
+
+def cases(rng, scale):
+    n = int(20000 * scale)
+    erg = erg_parents(n, 10 / n, 200, rng)
+    yield "ERG 10% infected, 10% vaccinated", erg, 0.1, 0.1
+    yield "ERG 0.1% infected, 10% vaccinated", erg, 0.001, 0.1
+    yield "Waxman 10% infected, 10% vaccinated", waxman_parents(int(3000 * scale), 200, rng), 0.1, 0.1
+    yield "chain 1 infected, 0.01% vaccinated", deep_parents(n, 50, rng, reach=1, root_prob=0), 0.0, 0.0001
+    deep = deep_parents(n, 200, rng)
+    yield "deep forest 1% infected, 1% vaccinated", deep, 0.01, 0.01
+    yield "deep forest 0.05% infected, 10% vaccinated", deep, 0.0005, 0.1
+
+def _best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start_time)
+    return min(times), result
+
+def run(scale=1.0, repeat=3, seed=0):
+    rng = np.random.default_rng(seed)
+    for name, parents, infected_ratio, vaccine_ratio in cases(rng, scale):
+        num_topologies, num_nodes = parents.shape
+        infected_idx = rng.choice(num_nodes, max(1, int(infected_ratio * num_nodes)), replace=False)
+        vaccinated_idx = rng.choice(np.setdiff1d(np.arange(num_nodes), infected_idx), int(vaccine_ratio * num_nodes),
+                                    replace=False)
+        graphs = topology_dicts(parents)
+        infected, vaccinated = infected_idx.tolist(), set(vaccinated_idx.tolist())
+        forest_time, forest = _best_time(lambda: build_infected_forest(parents, infected_idx), 1)
+
+        loop_time, expected = _best_time(lambda: [get_infected(graph, infected, vaccinated) for graph in graphs], repeat)
+        eval_time, (total, per_topology) = _best_time(lambda: count_infected(parents, infected_idx, vaccinated_idx), repeat)
+        in_forest_time, (_, in_forest) = _best_time(
+            lambda: count_infected_in_forest(forest, vaccinated_idx, num_topologies, len(infected_idx)), repeat)
+        if per_topology.tolist() != expected or in_forest.tolist() != expected:
+            raise AssertionError(f"{name}: the evaluators disagree with get_infected")
+        print(f"{name} ({num_topologies} x {num_nodes}, {total / parents.size:.1%} of pairs infected): "
+              f"get_infected loop {loop_time:.4f} s, count_infected {eval_time:.4f} s ({loop_time / eval_time:.1f}x), "
+              f"count_infected_in_forest {in_forest_time:.4f} s ({loop_time / in_forest_time:.1f}x, "
+              f"forest built once in {forest_time:.4f} s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark count_infected against the get_infected loop.")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the number of nodes")
+    parser.add_argument("--repeat", type=int, default=3, help="best of this many runs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.scale, args.repeat, args.seed)
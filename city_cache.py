@@ -0,0 +1,89 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# One memory-mappable .npy file per state, rows sorted by population (largest first)
+CITY_DTYPE = np.dtype([('lat', np.float64), ('lng', np.float64), ('population', np.int64), ('density', np.float64)])
+MANIFEST_FILENAME = "manifest.json"
+
+
+def default_cache_dir(xlsx_path):
+    return os.path.join(os.path.dirname(os.path.abspath(xlsx_path)), ".uscities_cache")
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST_FILENAME), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST_FILENAME)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+def build_city_cache(xlsx_path='uscities.xlsx', cache_dir=None):
+    import pandas as pd
+
+    cache_dir = default_cache_dir(xlsx_path) if cache_dir is None else cache_dir
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = os.stat(xlsx_path)
+    sha256 = _file_sha256(xlsx_path)
+
+    df = pd.read_excel(xlsx_path, usecols=['state_id', 'lat', 'lng', 'population', 'density'])
+    df = df.sort_values(by='population', ascending=False, kind='stable')
+    state_ids = sorted(df['state_id'].unique())
+    for state_id, state_df in df.groupby('state_id', sort=False):
+        rows = np.empty(len(state_df), dtype=CITY_DTYPE)
+        for column in CITY_DTYPE.names:
+            rows[column] = state_df[column].to_numpy()
+        path = os.path.join(cache_dir, f"{state_id}.npy")
+        # np.save appends .npy to names without it, so write to a .tmp.npy and rename
+        np.save(path[:-len(".npy")] + ".tmp.npy", rows)
+        os.replace(path[:-len(".npy")] + ".tmp.npy", path)
+
+    # The manifest is written last so a half-built cache is never considered valid
+    manifest = {"source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns,
+                "source_sha256": sha256, "states": state_ids}
+    _write_manifest(cache_dir, manifest)
+    return manifest
+
+def ensure_city_cache(xlsx_path='uscities.xlsx', cache_dir=None):
+    # Returns the manifest of a cache that matches the current xlsx, rebuilding it if the
+    # xlsx has changed. Size and mtime are checked first; the content hash only when they differ.
+    cache_dir = default_cache_dir(xlsx_path) if cache_dir is None else cache_dir
+    manifest = _read_manifest(cache_dir)
+    if manifest is None:
+        return build_city_cache(xlsx_path, cache_dir)
+
+    stat = os.stat(xlsx_path)
+    if manifest["source_size"] == stat.st_size and manifest["source_mtime_ns"] == stat.st_mtime_ns:
+        return manifest
+    if manifest["source_size"] == stat.st_size and manifest["source_sha256"] == _file_sha256(xlsx_path):
+        # Touched but unchanged
+        manifest["source_mtime_ns"] = stat.st_mtime_ns
+        _write_manifest(cache_dir, manifest)
+        return manifest
+    return build_city_cache(xlsx_path, cache_dir)
+
+def list_state_ids(xlsx_path='uscities.xlsx', cache_dir=None):
+    return ensure_city_cache(xlsx_path, cache_dir)["states"]
+
+def load_state_cities(state_id, xlsx_path='uscities.xlsx', cache_dir=None):
+    cache_dir = default_cache_dir(xlsx_path) if cache_dir is None else cache_dir
+    manifest = ensure_city_cache(xlsx_path, cache_dir)
+    if state_id not in manifest["states"]:
+        raise ValueError(f"Unknown state_id {state_id!r} in {xlsx_path}")
+
+    rows = np.load(os.path.join(cache_dir, f"{state_id}.npy"), mmap_mode='r')
+    return {column: rows[column] for column in CITY_DTYPE.names}
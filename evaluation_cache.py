@@ -0,0 +1,145 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from topology_eval import count_infected
+
+# Memoized count_infected keyed by the vaccinated set. The key of a set is the sum (mod
+# 2^64, in two independent lanes) of a per-node hash, so it does not depend on the order
+# of the nodes and the key of a set with one node added or removed is one addition away.
+# Every entry keeps the sorted set itself, so a hash collision can never return the
+# counts of another set. Entries are evicted least recently used first once the
+# estimated memory of the cache exceeds max_bytes.
+ENTRY_OVERHEAD = 200
+INDEX_ENTRY_BYTES = 100
+HASH_SEEDS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xD1B54A32D192ED03))
+
+
+def _node_hashes(nodes, seed):
+    # splitmix64 of every node index
+    with np.errstate(over='ignore'):
+        z = np.asarray(nodes, dtype=np.uint64) * seed + np.uint64(0x632BE59BD9B4E019)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+
+def _set_key(nodes):
+    return tuple(int(_node_hashes(nodes, seed).sum(dtype=np.uint64)) for seed in HASH_SEEDS)
+
+def _minus_one_keys(key, nodes):
+    # Keys of the sets with one of nodes removed, one per node
+    with np.errstate(over='ignore'):
+        lanes = [np.uint64(lane) - _node_hashes(nodes, seed) for lane, seed in zip(key, HASH_SEEDS)]
+    return list(zip(*(lane.tolist() for lane in lanes)))
+
+def make_evaluation_cache(parents, infected_idx, max_bytes=256 << 20, per_topology=False, evaluate=None):
+    # evaluate(vaccinated_idx) -> (total, per topology counts) defaults to count_infected
+    # on parents (pass e.g. a topology_pool call instead). With per_topology=True a set
+    # that is one node away from a cached set is evaluated only on the topologies where
+    # that node is reachable from an initially infected node; the other topologies keep
+    # the cached counts.
+    if evaluate is None:
+        def evaluate(vaccinated_idx):
+            return count_infected(parents, infected_idx, vaccinated_idx)
+    is_seed = np.zeros(parents.shape[1], dtype=bool)
+    is_seed[np.asarray(infected_idx, dtype=np.int64)] = True
+    return {"parents": parents, "infected_idx": np.asarray(infected_idx, dtype=np.int64), "is_seed": is_seed,
+            "evaluate": evaluate, "per_topology": per_topology, "max_bytes": max_bytes,
+            "entries": OrderedDict(), "minus_one": {}, "bytes": 0,
+            "hits": 0, "misses": 0, "neighbour_hits": 0, "evictions": 0,
+            "topologies_evaluated": 0, "topologies_reused": 0}
+
+def cache_stats(cache):
+    lookups = cache["hits"] + cache["misses"]
+    return {key: cache[key] for key in ("hits", "misses", "neighbour_hits", "evictions", "bytes",
+                                        "topologies_evaluated", "topologies_reused")} | {
+        "entries": len(cache["entries"]), "hit_rate": cache["hits"] / lookups if lookups else 0.0}
+
+def _evict(cache, key):
+    vaccinated, _, _, size = cache["entries"].pop(key)
+    cache["bytes"] -= size
+    cache["evictions"] += 1
+    if cache["per_topology"]:
+        for minus_key in _minus_one_keys(key, vaccinated):
+            if cache["minus_one"].get(minus_key) == key:
+                del cache["minus_one"][minus_key]
+
+def _store(cache, key, vaccinated, total, per_topology):
+    size = ENTRY_OVERHEAD + vaccinated.nbytes + per_topology.nbytes
+    if cache["per_topology"]:
+        size += INDEX_ENTRY_BYTES * len(vaccinated)
+        # Index of every set one node smaller, to find this entry from its subsets
+        cache["minus_one"].update(dict.fromkeys(_minus_one_keys(key, vaccinated), key))
+    cache["entries"][key] = (vaccinated, total, per_topology, size)
+    cache["bytes"] += size
+    while cache["bytes"] > cache["max_bytes"] and len(cache["entries"]) > 1:
+        _evict(cache, next(iter(cache["entries"])))
+
+def _reachable_topologies(cache, node, vaccinated):
+    # Topologies where node's parent chain reaches an initially infected node before a
+    # vaccinated node, a root or a cycle (Brent's cycle detection, all topologies in step)
+    parents = cache["parents"]
+    blocked = cache["is_seed"].copy()
+    blocked[vaccinated] = True
+    rows = np.arange(parents.shape[0])
+    current = np.asarray(parents[:, node], dtype=np.int64)
+    saved = np.full(len(rows), node, dtype=np.int64)
+    reachable = []
+    step, power = 0, 1
+    while len(rows):
+        alive = current >= 0
+        rows, current, saved = rows[alive], current[alive], saved[alive]
+        reached = cache["is_seed"][current]
+        reachable.append(rows[reached])
+        open_rows = ~blocked[current] & (current != saved)
+        rows, current, saved = rows[open_rows], current[open_rows], saved[open_rows]
+        step += 1
+        if step == power:
+            saved, power = current.copy(), power * 2
+        current = np.asarray(parents[rows, current], dtype=np.int64) if len(rows) else current
+    return np.concatenate(reachable) if reachable else rows
+
+def _neighbour(cache, key, vaccinated):
+    # A cached set that differs from vaccinated by one node, as (key, node, added)
+    entries = cache["entries"]
+    for node, smaller in zip(vaccinated.tolist(), _minus_one_keys(key, vaccinated)):
+        if smaller in entries and np.array_equal(entries[smaller][0], vaccinated[vaccinated != node]):
+            return smaller, node, True
+    larger = cache["minus_one"].get(key)
+    if larger is not None and larger in entries:
+        cached = entries[larger][0]
+        missing = np.setdiff1d(cached, vaccinated)
+        if len(missing) == 1 and len(cached) == len(vaccinated) + 1:
+            return larger, int(missing[0]), False
+    return None
+
+def cached_count_infected(cache, vaccinated_idx):
+    # Same result as count_infected(parents, infected_idx, vaccinated_idx)
+    vaccinated = np.unique(np.asarray(list(vaccinated_idx), dtype=np.int64))
+    key = _set_key(vaccinated)
+    entry = cache["entries"].get(key)
+    if entry is not None and np.array_equal(entry[0], vaccinated):
+        cache["hits"] += 1
+        cache["entries"].move_to_end(key)
+        return entry[1], entry[2]
+    cache["misses"] += 1
+
+    neighbour = _neighbour(cache, key, vaccinated) if cache["per_topology"] else None
+    if neighbour is None:
+        total, per_topology = cache["evaluate"](vaccinated)
+        cache["topologies_evaluated"] += len(per_topology)
+    else:
+        neighbour_key, node, _ = neighbour
+        cache["neighbour_hits"] += 1
+        cache["entries"].move_to_end(neighbour_key)
+        per_topology = cache["entries"][neighbour_key][2].copy()
+        # Vaccinating an initially infected node changes nothing
+        rows = np.empty(0, dtype=np.int64) if cache["is_seed"][node] else \
+            np.sort(_reachable_topologies(cache, node, vaccinated[vaccinated != node]))
+        if len(rows):
+            per_topology[rows] = count_infected(cache["parents"][rows], cache["infected_idx"], vaccinated)[1]
+        cache["topologies_evaluated"] += len(rows)
+        cache["topologies_reused"] += len(per_topology) - len(rows)
+        total = int(per_topology.sum())
+    _store(cache, key, vaccinated, total, per_topology)
+    return total, per_topology
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from LT_generate_ERG import generate_erdos_renyi_graph
+from LT_generate_waxman_gaussian import generate_waxman_graph_gaussian
+from lt_graph_io import BINARY_EXTENSION
+
+GENERATORS = {
+    "erg": generate_erdos_renyi_graph,
+    "waxman": generate_waxman_graph_gaussian,
+}
+MANIFEST_FILENAME = "ensemble_manifest.json"
+
+
+def _member_filename(output_dir, kind, index, binary):
+    return os.path.join(output_dir, f"LT_{kind}_{index:04d}" + (BINARY_EXTENSION if binary else ".txt"))
+
+def _generate_member(job):
+    # A member's graph depends only on (entropy, spawn_key), never on which worker runs it
+    kind, params, entropy, spawn_key, filename = job
+    rng = np.random.default_rng(np.random.SeedSequence(entropy, spawn_key=tuple(spawn_key)))
+    GENERATORS[kind](**params, output_filename=filename, rng=rng)
+    return filename
+
+def generate_ensemble(kind, count, params, master_seed=None, output_dir=".", max_workers=None, binary=False):
+    # Generates `count` graphs in a process pool. Each one gets its own child of
+    # SeedSequence(master_seed), and the manifest written to output_dir records every
+    # child's (entropy, spawn_key) so regenerate_member can rebuild any single graph.
+    if kind not in GENERATORS:
+        raise ValueError(f"Unknown generator {kind!r}, expected one of {sorted(GENERATORS)}")
+    os.makedirs(output_dir, exist_ok=True)
+    seed_sequence = np.random.SeedSequence(master_seed)
+
+    members = []
+    for index, child in enumerate(seed_sequence.spawn(count)):
+        members.append({"index": index, "filename": _member_filename(output_dir, kind, index, binary),
+                        "entropy": child.entropy, "spawn_key": list(child.spawn_key)})
+    manifest = {"kind": kind, "master_seed": seed_sequence.entropy, "params": params, "members": members}
+    manifest_filename = os.path.join(output_dir, MANIFEST_FILENAME)
+    with open(manifest_filename, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    jobs = [(kind, params, member["entropy"], member["spawn_key"], member["filename"]) for member in members]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(_generate_member, jobs))
+
+    print(f"{count} {kind} graphs with master seed {seed_sequence.entropy}, manifest in {manifest_filename}")
+    return manifest
+
+def regenerate_member(manifest_filename, index, output_filename=None):
+    # Rebuilds member `index` of an ensemble bit-for-bit (given the same NumPy version)
+    with open(manifest_filename, "r") as f:
+        manifest = json.load(f)
+    member = manifest["members"][index]
+    filename = member["filename"] if output_filename is None else output_filename
+    return _generate_member((manifest["kind"], manifest["params"], member["entropy"], member["spawn_key"], filename))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate reproducible ensembles of LT graphs in parallel.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate")
+    generate.add_argument("kind", choices=sorted(GENERATORS))
+    generate.add_argument("--count", type=int, required=True)
+    generate.add_argument("--seed", type=int, default=None, help="master seed (random when omitted, see the manifest)")
+    generate.add_argument("--workers", type=int, default=None)
+    generate.add_argument("--output-dir", default=".")
+    generate.add_argument("--binary", action="store_true")
+    generate.add_argument("--num-nodes", type=int, required=True)
+    generate.add_argument("--infected-ratio", type=float, default=0.1)
+    generate.add_argument("--num-instances", type=int, default=50)
+    generate.add_argument("--vaccine-ratio", type=float, default=0.1)
+    generate.add_argument("--prob", type=float, default=0.3, help="erg: edge probability")
+    generate.add_argument("--num-centers", type=int, default=10, help="waxman: number of Gaussian centers")
+    generate.add_argument("--alpha", type=float, default=0.1, help="waxman: alpha")
+    generate.add_argument("--beta", type=float, default=0.9, help="waxman: beta")
+
+    regenerate = subparsers.add_parser("regenerate")
+    regenerate.add_argument("manifest")
+    regenerate.add_argument("index", type=int)
+    regenerate.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    if args.command == "regenerate":
+        print(f"member {args.index} regenerated in", regenerate_member(args.manifest, args.index, args.output))
+    else:
+        params = dict(num_nodes=args.num_nodes, infected_ratio=args.infected_ratio,
+                      num_instances=args.num_instances, vaccine_ratio=args.vaccine_ratio)
+        if args.kind == "erg":
+            params.update(prob=args.prob)
+        else:
+            params.update(num_centers=args.num_centers, alpha=args.alpha, beta=args.beta)
+        generate_ensemble(args.kind, args.count, params, args.seed, args.output_dir, args.workers, args.binary)
@@ -0,0 +1,249 @@
+import heapq
+import sys
+import time
+
+import numpy as np
+
+from topology_eval import infected_pairs
+
+# In a live-edge topology every infected node that is not initially infected got the
+# infection from its parent, so the infected nodes form a forest rooted at the children
+# of initially infected nodes (the "infected forest"; initially infected nodes are never
+# vaccinated and are left out). Vaccinating v saves exactly the nodes of v's subtree in
+# that forest, so the marginal gain of v summed over all topologies is the sum of its
+# subtree sizes, and all gains come out of one bottom-up pass. After a pick only the
+# ancestors of v (their subtree sizes shrink) and v's subtree (it is removed) change.
+
+
+def _gather_children(forest, frontier):
+    # Forest indices of the children of every node in frontier, grouped by parent
+    offsets = forest["child_offsets"]
+    counts = offsets[frontier + 1] - offsets[frontier]
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    starts = np.repeat(offsets[frontier] - np.cumsum(counts) + counts, counts)
+    return forest["children"][starts + np.arange(total)]
+
+def build_infected_forest(parents, infected_idx, block_size=None):
+    # Flattens the infected non-seed (topology, node) pairs of all topologies into one
+    # forest with the node and topology of every pair, parent, children (CSR) and
+    # per-node (CSR) indices, plus the subtree size of every pair and the total gain of
+    # every node.
+    num_nodes = parents.shape[1]
+    pairs = infected_pairs(parents, infected_idx, block_size=block_size)
+    num_pairs = len(pairs)
+
+    node_of = (pairs % num_nodes).astype(np.int32)
+    parent_pairs = pairs - node_of + np.asarray(parents).ravel()[pairs]
+    # An infected pair's parent is infected, so it is either a seed or in pairs
+    parent = np.searchsorted(pairs, parent_pairs)
+    in_forest = parent < num_pairs
+    in_forest[in_forest] = pairs[parent[in_forest]] == parent_pairs[in_forest]
+    parent = np.where(in_forest, parent, -1)
+
+    children = np.argsort(parent, kind='stable')[num_pairs - int(in_forest.sum()):]
+    child_offsets = np.zeros(num_pairs + 1, dtype=np.int64)
+    np.cumsum(np.bincount(parent[in_forest], minlength=num_pairs), out=child_offsets[1:])
+    node_pairs = np.argsort(node_of, kind='stable')
+    node_offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(node_of, minlength=num_nodes), out=node_offsets[1:])
+
+    forest = {"node_of": node_of, "topology_of": (pairs // num_nodes).astype(np.int32), "parent": parent,
+              "children": children, "child_offsets": child_offsets, "node_pairs": node_pairs, "node_offsets": node_offsets,
+              "alive": np.ones(num_pairs, dtype=bool), "subtree": np.ones(num_pairs, dtype=np.int64)}
+
+    # Top-down levels from the roots (each level lists the children of the previous one,
+    # grouped by parent)
+    levels = [np.flatnonzero(~in_forest)]
+    while len(levels[-1]):
+        levels.append(_gather_children(forest, levels[-1]))
+    forest["levels"] = levels[:-1]
+    forest["subtree"] = subtree_sizes(forest)
+    forest["gain"] = np.bincount(node_of, weights=forest["subtree"], minlength=num_nodes).astype(np.int64)
+    _add_preorder(forest, parents.shape[0])
+    return forest
+
+def _add_preorder(forest, num_topologies):
+    # Lays the pairs out in depth-first preorder, so the subtree of the pair at position p
+    # is the range p, ..., p + size - 1, and keeps the node and (initial) subtree size of
+    # every position for count_infected_in_forest. The roots are in topology order, so
+    # every topology is one range too. A child starts right after its parent plus the
+    # subtrees of its earlier siblings.
+    parent, subtree = forest["parent"], forest["subtree"]
+    preorder = np.empty(len(parent), dtype=np.int64)
+    roots = forest["levels"][0]
+    preorder[roots] = np.cumsum(subtree[roots]) - subtree[roots]
+    for level in forest["levels"][1:]:
+        level_parents = parent[level]
+        before = np.cumsum(subtree[level]) - subtree[level]
+        starts = np.flatnonzero(np.r_[True, level_parents[1:] != level_parents[:-1]])
+        before -= np.repeat(before[starts], np.diff(np.r_[starts, len(level)]))
+        preorder[level] = preorder[level_parents] + 1 + before
+    order = np.empty_like(preorder)
+    order[preorder] = np.arange(len(order))
+    forest["preorder_node"] = forest["node_of"][order]
+    forest["preorder_size"] = subtree[order]
+    forest["topology_offsets"] = np.zeros(num_topologies + 1, dtype=np.int64)
+    np.cumsum(np.bincount(forest["topology_of"], minlength=num_topologies), out=forest["topology_offsets"][1:])
+
+def subtree_sizes(forest, cut=None):
+    # Subtree size of every pair, bottom-up one level at a time with segmented sums.
+    # Pairs marked in cut (vaccinated) keep their own subtree size but add nothing to
+    # their parent's.
+    parent = forest["parent"]
+    subtree = np.ones(len(parent), dtype=np.int64)
+    for level in reversed(forest["levels"][1:]):
+        level_parents = parent[level]
+        starts = np.flatnonzero(np.r_[True, level_parents[1:] != level_parents[:-1]])
+        contributions = subtree[level] if cut is None else np.where(cut[level], 0, subtree[level])
+        subtree[level_parents[starts]] += np.add.reduceat(contributions, starts)
+    return subtree
+
+def count_infected_in_forest(forest, vaccinated_idx, num_topologies, num_infected):
+    # Same (total, per topology counts) as topology_eval.count_infected for topologies
+    # whose forest this is. A vaccinated pair saves its preorder range; the ranges of a
+    # forest are nested or disjoint, so the outermost ones (those starting past the end of
+    # every earlier one) add up to the saved pairs. This costs one gather over the forest's
+    # pairs, instead of a pass over the parent matrix, and no loop over its levels.
+    # num_infected is the number of initially infected nodes; the alive flags and subtree
+    # sizes of a greedy run are ignored.
+    vaccinated = np.zeros(len(forest["node_offsets"]) - 1, dtype=bool)
+    vaccinated[np.asarray(vaccinated_idx, dtype=np.int64)] = True
+    starts = np.flatnonzero(vaccinated.take(forest["preorder_node"]))
+    sizes = forest["preorder_size"].take(starts)
+    ends = np.maximum.accumulate(starts + sizes)
+    outermost = starts >= np.r_[0, ends][:len(starts)]
+    starts, saved = starts[outermost], np.r_[0, np.cumsum(sizes[outermost])]
+    # Saved pairs of every topology, from the ranges that start within it
+    saved = np.diff(saved[np.searchsorted(starts, forest["topology_offsets"][:num_topologies + 1])])
+    per_topology = num_infected + np.diff(forest["topology_offsets"][:num_topologies + 1]) - saved
+    return int(per_topology.sum()), per_topology
+
+def node_gain(forest, node):
+    # Current gain of node, from its subtree sizes in every topology
+    pairs = forest["node_pairs"][forest["node_offsets"][node]:forest["node_offsets"][node + 1]]
+    return int(forest["subtree"][pairs].sum())
+
+def vaccinate_in_forest(forest, node, update_gains=True):
+    # Removes node's subtrees from the forest in every topology and updates the subtree
+    # sizes of their ancestors (and the gains, unless the caller evaluates gains lazily
+    # with node_gain); returns the number of saved pairs
+    node_of, parent, alive, subtree, gain = (forest[key] for key in ("node_of", "parent", "alive", "subtree", "gain"))
+    pairs = forest["node_pairs"][forest["node_offsets"][node]:forest["node_offsets"][node + 1]]
+    pairs = pairs[alive[pairs]]
+    if len(pairs) == 0:
+        return 0
+    removed = subtree[pairs]
+
+    # Ancestors lose the whole subtree (one step up in all topologies at a time)
+    ancestors, amounts = parent[pairs], removed
+    while len(ancestors):
+        has_ancestor = ancestors >= 0
+        ancestors, amounts = ancestors[has_ancestor], amounts[has_ancestor]
+        subtree[ancestors] -= amounts
+        if update_gains:
+            np.subtract.at(gain, node_of[ancestors], amounts)
+        ancestors = parent[ancestors]
+
+    # The subtree itself leaves the forest
+    frontier = pairs
+    while len(frontier):
+        alive[frontier] = False
+        if update_gains:
+            np.subtract.at(gain, node_of[frontier], subtree[frontier])
+        subtree[frontier] = 0
+        frontier = _gather_children(forest, frontier)
+        frontier = frontier[alive[frontier]]
+    return int(removed.sum())
+
+def label_ranks(nodes):
+    # Rank of every node label in string order, the order the C++ programs iterate
+    # their set<string> of nodes in
+    ranks = np.empty(len(nodes), dtype=np.int64)
+    ranks[np.argsort(np.asarray(nodes).astype(str), kind='stable')] = np.arange(len(nodes))
+    return ranks
+
+def _best_candidate(gain, available, ranks):
+    # Highest gain, ties broken by the smallest string rank like getInitialKNodes
+    candidates = np.flatnonzero(available)
+    candidate_gains = gain[candidates]
+    best = candidates[candidate_gains == candidate_gains.max()]
+    return int(best[np.argmin(ranks[best])])
+
+def _lazy_greedy(forest, available, ranks, budget):
+    # CELF: the saved-pairs objective is monotone submodular over fixed instances, so a
+    # gain computed in an earlier round is an upper bound on the current one. The heap
+    # holds (-bound, rank) entries; only the top is re-evaluated, and it is picked once
+    # its gain is current, which gives the same picks and tie-breaks as the full scan.
+    heap = [(-int(forest["gain"][node]), int(ranks[node]), int(node), 0) for node in np.flatnonzero(available)]
+    heapq.heapify(heap)
+    picks, gains, evaluations, skipped = [], [], 0, 0
+    for round_index in range(budget):
+        round_evaluations = 0
+        while True:
+            negative_bound, rank, node, evaluated_round = heapq.heappop(heap)
+            if evaluated_round == round_index:
+                break
+            round_evaluations += 1
+            heapq.heappush(heap, (-node_gain(forest, node), rank, node, round_index))
+        # A full scan would have evaluated every remaining candidate
+        evaluations += round_evaluations
+        skipped += len(heap) + 1 - round_evaluations
+        gains.append(vaccinate_in_forest(forest, node, update_gains=False))
+        picks.append(node)
+    return picks, gains, evaluations, skipped
+
+def greedy_vaccination(parents, infected_idx, budget, nodes, lazy=False, forest=None):
+    # Python counterpart of LinearThresholdNetwork::getInitialKNodes on the same live-edge
+    # instances: picks `budget` nodes one at a time, each with the largest number of saved
+    # (topology, node) pairs. Returns the picks (as labels, in order) and their gains.
+    # lazy=True uses lazy greedy (CELF) and also reports how many gain evaluations it
+    # skipped compared to re-scoring every candidate in every round. A forest passed in is
+    # updated in place (only its subtree sizes, gains and alive flags).
+    nodes = np.asarray(nodes)
+    forest = build_infected_forest(parents, infected_idx) if forest is None else forest
+    ranks = label_ranks(nodes)
+    available = np.ones(len(nodes), dtype=bool)
+    available[np.asarray(infected_idx, dtype=np.int64)] = False
+    budget = min(int(budget), int(available.sum()))
+
+    if lazy:
+        picks, gains, evaluations, skipped = _lazy_greedy(forest, available, ranks, budget)
+        return {"solution": nodes[picks].tolist(), "indices": picks, "gains": gains,
+                "evaluations": evaluations, "skipped_evaluations": skipped}
+
+    picks, gains, evaluations = [], [], 0
+    for _ in range(budget):
+        evaluations += int(available.sum())
+        node = _best_candidate(forest["gain"], available, ranks)
+        gains.append(vaccinate_in_forest(forest, node))
+        available[node] = False
+        picks.append(node)
+    return {"solution": nodes[picks].tolist(), "indices": picks, "gains": gains,
+            "evaluations": evaluations, "skipped_evaluations": 0}
+
+if __name__ == "__main__":
+    lazy = "--lazy" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--lazy"]
+    if len(args) not in (2, 3):
+        print(f"Usage: {sys.argv[0]} <graph> <topology store or json> [num vaccines] [--lazy]")
+        sys.exit(1)
+    from lt_graph_io import read_graph
+    from topology_store import load_topologies, node_indices
+
+    graph_data = read_graph(args[0])
+    store = load_topologies(args[1], graph_data["nodes"], graph_data["infected"])
+    budget = int(args[2]) if len(args) == 3 else graph_data["num_vaccines"]
+    infected_idx = node_indices(store["nodes"], store["infected"])
+
+    start_time = time.time()
+    forest = build_infected_forest(store["parents"], infected_idx)
+    result = greedy_vaccination(store["parents"], infected_idx, budget, store["nodes"], lazy, forest)
+    end_time = time.time()
+    # Same output as the C++ greedy: total infected over all instances, then the time
+    print(count_infected_in_forest(forest, result["indices"], len(store["parents"]), len(np.unique(infected_idx)))[0])
+    print(end_time - start_time)
+    print(" ".join(map(str, result["solution"])))
+    if lazy:
+        print(f"{result['evaluations']} gain evaluations, {result['skipped_evaluations']} skipped")
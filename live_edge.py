@@ -0,0 +1,69 @@
+import sys
+
+import numpy as np
+
+from lt_graph_io import csr_sources, read_graph
+
+
+def _incoming_segments(num_nodes, sources, targets, weights):
+    # Edges grouped by target (stable, so every node keeps its incoming edge order) and
+    # keyed by target + cumulative incoming weight. The keys of node v lie in [v, v + 1]
+    # for a valid network, so they are sorted across all nodes and one searchsorted
+    # call resolves every node of every instance.
+    order = np.argsort(targets, kind='stable')
+    sorted_targets = np.asarray(targets)[order]
+    sorted_sources = np.asarray(sources)[order].astype(np.int32)
+    cumulative = np.cumsum(np.asarray(weights, dtype=np.float64)[order])
+    starts = np.flatnonzero(np.r_[True, sorted_targets[1:] != sorted_targets[:-1]]) if len(order) else np.empty(0, dtype=np.int64)
+    segment_offsets = np.r_[0.0, cumulative][starts]
+    counts = np.diff(np.r_[starts, len(order)])
+    keys = sorted_targets + (cumulative - np.repeat(segment_offsets, counts))
+    return keys, sorted_targets, sorted_sources
+
+def sample_live_edge_parents(num_nodes, sources, targets, weights, num_instances, rng=None, block_size=None):
+    # NumPy version of LinearThresholdNetwork::getDeterministicInstances. In every instance
+    # each node draws r ~ U[0, 1) and keeps the first incoming edge whose cumulative
+    # weight exceeds r (none when r is past the total). Returns an int32
+    # (num_instances, num_nodes) matrix of parent indices, -1 for no parent.
+    # Instances are drawn block_size at a time to bound the temporary arrays.
+    rng = np.random.default_rng() if rng is None else rng
+    num_instances = int(num_instances)
+    block_size = max(1, (1 << 22) // max(num_nodes, 1)) if block_size is None else block_size
+    parents = np.full((num_instances, num_nodes), -1, dtype=np.int32)
+    if len(targets) == 0:
+        return parents
+
+    keys, sorted_targets, sorted_sources = _incoming_segments(num_nodes, sources, targets, weights)
+    node_ids = np.arange(num_nodes, dtype=np.float64)
+    for start in range(0, num_instances, block_size):
+        stop = min(start + block_size, num_instances)
+        queries = node_ids + rng.random((stop - start, num_nodes))
+        # side='right' finds the first key > node + r, which is `random < sum` in the C++ loop
+        selected = np.searchsorted(keys, queries, side='right')
+        # Past the end of a node's segment the lookup lands on the next node (or past all keys)
+        in_range = selected < len(keys)
+        np.minimum(selected, len(keys) - 1, out=selected)
+        has_parent = in_range & (sorted_targets[selected] == np.arange(num_nodes))
+        parents[start:stop] = np.where(has_parent, sorted_sources[selected], -1)
+    return parents
+
+def sample_graph_parents(graph_data, num_instances=None, rng=None):
+    # Same as sample_live_edge_parents for a graph dict returned by lt_graph_io.read_graph
+    num_instances = graph_data["num_instances"] if num_instances is None else num_instances
+    if num_instances is None:
+        raise ValueError("The graph has no NUM_INSTANCES, pass num_instances")
+    return sample_live_edge_parents(len(graph_data["nodes"]), csr_sources(graph_data["offsets"]),
+                                    graph_data["targets"], graph_data["weights"], num_instances, rng)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print(f"Usage: {sys.argv[0]} <graph> <topology store prefix> [seed]")
+        sys.exit(1)
+    from topology_store import PARENTS_SUFFIX, write_topology_store
+
+    graph_data = read_graph(sys.argv[1])
+    rng = np.random.default_rng(int(sys.argv[3]) if len(sys.argv) == 4 else None)
+    parents = sample_graph_parents(graph_data, rng=rng)
+    write_topology_store(sys.argv[2], parents, graph_data["nodes"], graph_data["infected"])
+    print(f"{parents.shape[0]} instances of {parents.shape[1]} nodes, output in {sys.argv[2]}{PARENTS_SUFFIX}")
@@ -0,0 +1,225 @@
+import time
+
+import numpy as np
+
+from greedy_vaccination import _gather_children, build_infected_forest, greedy_vaccination, label_ranks, subtree_sizes
+from topology_eval import count_infected
+
+# Swap local search (getKBestVaccinationsLocalSearch / getKBestVaccinationsHillClimbing of
+# linear_threshold_greedy_LS_HC.cpp) on the infected forest of greedy_vaccination, built
+# without any vaccination. With a vaccinated set S every pair keeps
+#   size[i]      its subtree size, not counting the subtrees of vaccinated descendants
+#   reachable[i] whether no strict ancestor is vaccinated
+# and gain[w] is the sum of size over w's reachable, unvaccinated pairs: the number of
+# pairs vaccinating w would save. Swapping u out only matters in the topologies where u
+# is reachable, and there the gain of w under S - u differs from gain[w] only on u's
+# ancestors (which get u's blocked subtree back) and inside that blocked subtree. Every
+# swap is scored from those pairs alone and applied by walking the same pairs.
+
+
+def _ancestor_paths(forest, cut, pairs):
+    # Ancestors of every pair up to and including the first vaccinated one, as flat
+    # (row into pairs, ancestor) arrays, and whether each pair is reachable
+    parent = forest["parent"]
+    rows, ancestors = [], []
+    reachable = np.ones(len(pairs), dtype=bool)
+    current_rows, current = np.arange(len(pairs)), parent[pairs]
+    while len(current):
+        has_parent = current >= 0
+        current_rows, current = current_rows[has_parent], current[has_parent]
+        rows.append(current_rows)
+        ancestors.append(current)
+        is_cut = cut[current]
+        reachable[current_rows[is_cut]] = False
+        current_rows, current = current_rows[~is_cut], parent[current[~is_cut]]
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), reachable
+    return np.concatenate(rows), np.concatenate(ancestors), reachable
+
+def _blocked_region(forest, cut, pairs):
+    # pairs and their descendants down to (not including) vaccinated pairs
+    region = [pairs]
+    frontier = pairs
+    while len(frontier):
+        frontier = _gather_children(forest, frontier)
+        frontier = frontier[~cut[frontier]]
+        region.append(frontier)
+    return np.concatenate(region)
+
+def _node_pairs(forest, node):
+    return forest["node_pairs"][forest["node_offsets"][node]:forest["node_offsets"][node + 1]]
+
+def init_swap_state(forest, vaccinated_idx):
+    node_of = forest["node_of"]
+    vaccinated = np.zeros(len(forest["node_offsets"]) - 1, dtype=bool)
+    vaccinated[np.asarray(vaccinated_idx, dtype=np.int64)] = True
+    cut = vaccinated[node_of]
+    size = subtree_sizes(forest, cut)
+
+    reachable = np.ones(len(node_of), dtype=bool)
+    parent = forest["parent"]
+    for level in forest["levels"][1:]:
+        reachable[level] = reachable[parent[level]] & ~cut[parent[level]]
+    gain = np.bincount(node_of, weights=np.where(reachable & ~cut, size, 0), minlength=len(vaccinated)).astype(np.int64)
+    return {"cut": cut, "size": size, "gain": gain, "vaccinated": vaccinated}
+
+def removal_deltas(forest, state, node):
+    # Change in saved pairs of every swap (node out, w in), as a vector over w
+    node_of, cut, size = forest["node_of"], state["cut"], state["size"]
+    pairs = _node_pairs(forest, node)
+    rows, ancestors, reachable = _ancestor_paths(forest, cut, pairs)
+    on_reachable_path = reachable[rows]
+    reachable_pairs = pairs[reachable]
+    num_nodes = len(state["gain"])
+
+    # Pairs saved by node today, given back by removing it
+    lost = int(size[reachable_pairs].sum())
+    # Ancestors of node get its blocked subtree back, and nodes inside the blocked subtree
+    # now save their own (vaccination-pruned) subtree
+    ancestor_bonus = np.bincount(node_of[ancestors[on_reachable_path]],
+                                 weights=size[pairs[rows[on_reachable_path]]], minlength=num_nodes)
+    region = _blocked_region(forest, cut, reachable_pairs)[len(reachable_pairs):]
+    inside_bonus = np.bincount(node_of[region], weights=size[region], minlength=num_nodes)
+    return state["gain"] + ancestor_bonus.astype(np.int64) + inside_bonus.astype(np.int64) - lost
+
+def _update_for_pairs(forest, state, pairs, sign):
+    # Adds (sign=1, unvaccinating) or removes (sign=-1, vaccinating) the subtrees of pairs
+    # along their ancestor paths; pairs are not cut while this runs
+    node_of, cut, size, gain = forest["node_of"], state["cut"], state["size"], state["gain"]
+    rows, ancestors, reachable = _ancestor_paths(forest, cut, pairs)
+    amounts = size[pairs][rows]
+    size[ancestors] += sign * amounts
+    on_reachable_path = reachable[rows]
+    np.add.at(gain, node_of[ancestors[on_reachable_path]], sign * amounts[on_reachable_path])
+    region = _blocked_region(forest, cut, pairs[reachable])
+    np.add.at(gain, node_of[region], sign * size[region])
+
+def apply_swap(forest, state, removed, added):
+    removed_pairs = _node_pairs(forest, removed)
+    state["cut"][removed_pairs] = False
+    state["vaccinated"][removed] = False
+    _update_for_pairs(forest, state, removed_pairs, 1)
+    added_pairs = _node_pairs(forest, added)
+    _update_for_pairs(forest, state, added_pairs, -1)
+    state["cut"][added_pairs] = True
+    state["vaccinated"][added] = True
+
+def adjacency_lists(parents):
+    # Nodes adjacent (as parent or child) to each node in any topology, as CSR arrays;
+    # the neighbourhood getKBestVaccinationsLocalSearch swaps with
+    num_nodes = parents.shape[1]
+    children = np.broadcast_to(np.arange(num_nodes), parents.shape)[parents >= 0]
+    edges = np.unique(parents[parents >= 0].astype(np.int64) * num_nodes + children)
+    ends = np.concatenate([edges // num_nodes, edges % num_nodes])
+    others = np.concatenate([edges % num_nodes, edges // num_nodes])
+    order = np.lexsort((others, ends))
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=num_nodes), out=offsets[1:])
+    return offsets, others[order]
+
+def swap_local_search(parents, infected_idx, initial_idx, nodes, mode="first", neighbourhood="infected",
+                      max_iterations=None, forest=None, log=print):
+    # Starts from initial_idx and applies improving swaps until none is left.
+    #   mode="first": the C++ scan order. The solution is kept in string order of labels;
+    #                 each slot takes the first improving swap (candidates in string
+    #                 order), the new node goes to the end. One iteration is one pass.
+    #   mode="best":  every iteration applies the best swap over all slots.
+    # neighbourhood="infected" tries every node that is ever infected, which gives the
+    # same swaps as hill climbing over all nodes (no other node can improve a solution);
+    # "adjacent" only tries nodes adjacent to the removed one in some topology, like
+    # getKBestVaccinationsLocalSearch.
+    if mode not in ("first", "best") or neighbourhood not in ("infected", "adjacent"):
+        raise ValueError(f"Unknown mode {mode!r} or neighbourhood {neighbourhood!r}")
+    nodes = np.asarray(nodes)
+    forest = build_infected_forest(parents, infected_idx) if forest is None else forest
+    ranks = label_ranks(nodes)
+    # Nodes that are never infected save nothing in any solution
+    on_infected_paths = np.zeros(len(nodes), dtype=bool)
+    on_infected_paths[forest["node_of"]] = True
+    if neighbourhood == "adjacent":
+        adjacency_offsets, adjacency = adjacency_lists(np.asarray(parents))
+
+    solution = sorted((int(node) for node in initial_idx), key=lambda node: ranks[node])
+    state = init_swap_state(forest, solution)
+    score = count_infected(parents, infected_idx, solution)[0]
+    log(f"initial: {score} infected")
+    iterations = []
+
+    def best_swap(node):
+        deltas = removal_deltas(forest, state, node)
+        candidates = on_infected_paths & ~state["vaccinated"]
+        if neighbourhood == "adjacent":
+            adjacent = np.zeros(len(nodes), dtype=bool)
+            adjacent[adjacency[adjacency_offsets[node]:adjacency_offsets[node + 1]]] = True
+            candidates &= adjacent
+        candidates = np.flatnonzero(candidates & (deltas > 0))
+        if len(candidates) == 0:
+            return None, 0
+        if mode == "first":
+            added = candidates[np.argmin(ranks[candidates])]
+        else:
+            best = candidates[deltas[candidates] == deltas[candidates].max()]
+            added = best[np.argmin(ranks[best])]
+        return int(added), int(deltas[added])
+
+    while max_iterations is None or len(iterations) < max_iterations:
+        start_time = time.time()
+        swaps = 0
+        if mode == "first":
+            slot = 0
+            while slot < len(solution):
+                added, delta = best_swap(solution[slot])
+                if added is None:
+                    slot += 1
+                    continue
+                apply_swap(forest, state, solution.pop(slot), added)
+                solution.append(added)
+                score -= delta
+                swaps += 1
+        else:
+            # Largest delta; ties go to the earliest slot, then the smallest label
+            moves = [(best_swap(node), slot) for slot, node in enumerate(solution)]
+            moves = [(-delta, slot, added) for (added, delta), slot in moves if added is not None]
+            if moves:
+                negative_delta, slot, added = min(moves)
+                delta = -negative_delta
+                apply_swap(forest, state, solution.pop(slot), added)
+                solution.append(added)
+                score -= delta
+                swaps = 1
+        elapsed = time.time() - start_time
+        iterations.append({"swaps": swaps, "score": score, "time": elapsed})
+        log(f"iteration {len(iterations)}: {swaps} swaps, {score} infected, {elapsed:.3f} seconds")
+        if swaps == 0:
+            break
+    return {"solution": nodes[solution].tolist(), "indices": solution, "score": score, "iterations": iterations}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from lt_graph_io import read_graph
+    from topology_store import load_topologies, node_indices
+
+    parser = argparse.ArgumentParser(description="Greedy followed by swap local search on sampled topologies.")
+    parser.add_argument("graph")
+    parser.add_argument("topologies", help="topology store or deterministicInstances json")
+    parser.add_argument("--num-vaccines", type=int, default=None)
+    parser.add_argument("--mode", choices=["first", "best"], default="first")
+    parser.add_argument("--neighbourhood", choices=["infected", "adjacent"], default="infected")
+    parser.add_argument("--max-iterations", type=int, default=None)
+    args = parser.parse_args()
+
+    graph_data = read_graph(args.graph)
+    store = load_topologies(args.topologies, graph_data["nodes"], graph_data["infected"])
+    budget = graph_data["num_vaccines"] if args.num_vaccines is None else args.num_vaccines
+    infected_idx = node_indices(store["nodes"], store["infected"])
+
+    start_time = time.time()
+    forest = build_infected_forest(store["parents"], infected_idx)
+    greedy = greedy_vaccination(store["parents"], infected_idx, budget, store["nodes"], lazy=True, forest=forest)
+    result = swap_local_search(store["parents"], infected_idx, greedy["indices"], store["nodes"], args.mode,
+                               args.neighbourhood, args.max_iterations, forest)
+    print(result["score"])
+    print(time.time() - start_time)
+    print(" ".join(map(str, result["solution"])))
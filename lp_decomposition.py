@@ -0,0 +1,114 @@
+import logging
+import time
+
+import numpy as np
+
+from evaluation_cache import cached_count_infected, make_evaluation_cache
+from greedy_vaccination import build_infected_forest
+
+# Lagrangian decomposition of the LP relaxation of lp_model.vaccination_problem, without
+# building the model. Every topology t gets its own copy y_t of the vaccinations on its
+# infected forest (the pairs some initially infected node reaches), tied to the shared y by
+# y_t[v] = y[v] with multipliers lam[t, v]. The relaxed problem splits into
+#   one min-cut problem per topology tree: min w_t * (infected pairs) + lam . y_t, whose
+#       LP is integral; bottom-up, a pair either is vaccinated (cost lam, nothing below is
+#       infected) or is infected (cost w_t plus its children's subproblems), and every
+#       pair with lam < 0 is vaccinated on top;
+#   the master problem: max (sum over t of lam[t]) . y with sum y = budget, solved by
+#       the budget largest sums.
+# Every multiplier vector gives a lower bound on the LP (and ILP) optimum; subgradient
+# steps raise it towards the LP optimum. Every master solution is a vaccination set,
+# whose exact infection count is an upper bound on the ILP optimum, so the gap between
+# the best of both bounds the distance from optimality of the best set.
+
+
+def _solve_subproblems(forest, multipliers, pair_weights):
+    # Total value of the topology subproblems and the optimal y_t of every pair
+    parent, levels = forest["parent"], forest["levels"]
+    negative = np.minimum(multipliers, 0.0)
+    value = np.zeros(len(parent))
+    children_value = np.zeros(len(parent))
+    # Sum of the negative multipliers strictly below every pair
+    below_negative = np.zeros(len(parent))
+    for index in range(len(levels) - 1, -1, -1):
+        level = levels[index]
+        value[level] = np.minimum(multipliers[level] + below_negative[level], pair_weights[level] + children_value[level])
+        if index == 0:
+            continue
+        level_parents = parent[level]
+        starts = np.flatnonzero(np.r_[True, level_parents[1:] != level_parents[:-1]])
+        children_value[level_parents[starts]] += np.add.reduceat(value[level], starts)
+        below_negative[level_parents[starts]] += np.add.reduceat(below_negative[level] + negative[level], starts)
+
+    # Top-down: a pair still reached by the infection takes the cheaper option, anything
+    # below a vaccinated pair only takes its negative multipliers
+    vaccinate = multipliers + below_negative <= pair_weights + children_value
+    reached = np.zeros(len(parent), dtype=bool)
+    if len(levels):
+        reached[levels[0]] = True
+    for level in levels[1:]:
+        reached[level] = reached[parent[level]] & ~vaccinate[parent[level]]
+    pair_y = np.where(reached, vaccinate, multipliers < 0).astype(float)
+    return float(value[levels[0]].sum()) if len(levels) else 0.0, pair_y
+
+def lagrangian_decomposition(parents, infected_idx, budget, weights=None, max_iterations=300, tolerance=1e-3,
+                             step_scale=2.0, patience=10, forest=None, log=logging.info):
+    # Subgradient ascent on the multipliers with Polyak steps towards the best upper
+    # bound; step_scale is halved after `patience` iterations without a better lower
+    # bound. Stops when (upper - lower) / upper <= tolerance. Returns {"solution" (node
+    # indices of the best set), "upper_bound", "lower_bound", "gap", "iterations"
+    # [{"lower", "upper", "step", "time"}]}; bounds are on sum over t of weights[t]
+    # times the infected nodes of topology t, initially infected nodes included.
+    num_topologies, num_nodes = parents.shape
+    infected_idx = np.asarray(infected_idx, dtype=np.int64)
+    weights = np.ones(num_topologies) if weights is None else np.asarray(weights, dtype=float)
+    forest = build_infected_forest(parents, infected_idx) if forest is None else forest
+    node_of = forest["node_of"]
+    pair_weights = weights[forest["topology_of"]]
+    budget = min(int(budget), num_nodes - len(np.unique(infected_idx)))
+    constant = float(weights.sum()) * len(np.unique(infected_idx))
+    available = np.ones(num_nodes, dtype=bool)
+    available[infected_idx] = False
+    cache = make_evaluation_cache(parents, infected_idx)
+
+    # Start from lam = w_t: the master then picks the most often infected nodes
+    multipliers = pair_weights.copy()
+    # The initially infected nodes are always infected
+    best_lower, best_upper, best_set = constant, np.inf, None
+    iterations, stalled = [], 0
+    for _ in range(max_iterations):
+        start_time = time.time()
+        subproblem_value, pair_y = _solve_subproblems(forest, multipliers, pair_weights)
+        totals = np.bincount(node_of, weights=multipliers, minlength=num_nodes)
+        # Master: the budget largest sums (ties by node index)
+        chosen = np.sort(np.argsort(np.where(available, -totals, np.inf), kind='stable')[:budget])
+        lower = constant + subproblem_value - float(totals[chosen].sum())
+
+        upper = float(cached_count_infected(cache, chosen)[1] @ weights)
+        if upper < best_upper:
+            best_upper, best_set = upper, chosen
+        if lower > best_lower + 1e-9:
+            best_lower, stalled = lower, 0
+        else:
+            stalled += 1
+            if stalled >= patience:
+                step_scale, stalled = step_scale / 2, 0
+
+        master_y = np.zeros(num_nodes)
+        master_y[chosen] = 1.0
+        subgradient = pair_y - master_y[node_of]
+        norm = float(subgradient @ subgradient)
+        step = step_scale * (best_upper - lower) / norm if norm > 0 else 0.0
+        iterations.append({"lower": lower, "upper": upper, "step": step, "time": time.time() - start_time})
+        gap = (best_upper - best_lower) / best_upper if best_upper > 0 else 0.0
+        if len(iterations) % 10 == 0:
+            log(f"iteration {len(iterations)}: lower bound {best_lower}, upper bound {best_upper}, gap {gap:.4%}")
+        # A zero subgradient means the multipliers are optimal
+        if gap <= tolerance or norm == 0:
+            break
+        multipliers += step * subgradient
+
+    gap = (best_upper - best_lower) / best_upper if best_upper > 0 else 0.0
+    log(f"{len(iterations)} iterations: lower bound {best_lower}, upper bound {best_upper}, gap {gap:.4%}")
+    return {"solution": best_set.tolist(), "upper_bound": best_upper, "lower_bound": best_lower, "gap": gap,
+            "iterations": iterations}
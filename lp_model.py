@@ -0,0 +1,120 @@
+import logging
+
+import numpy as np
+import scipy.sparse as sp
+
+from topology_eval import infected_mask, infected_pairs
+
+# Matrix form of the vaccination model of ILP.py, LP_TKR.py and LP_IRP.py, built straight
+# from the (T, N) parent matrix of a topology store. x[t, v] is the infection of node v in
+# topology t and y[v] its vaccination:
+#   minimize    sum over t, v of weight[t] * x[t, v]
+#   subject to  x[t, v] >= x[t, parent] - y[v]   for every live edge parent -> v
+#               sum of y = budget
+#               x[t, s] = 1 and y[s] = 0         for every initially infected s
+# The edge constraints are the rows of one sparse matrix, and the problem is plain arrays
+# that every backend of lp_solvers.py builds its model from.
+#
+# Presolve: a pair (t, v) that no initially infected node reaches in topology t (even
+# without vaccination) is 0 at the optimum, so it gets no column and its edge gets no row;
+# initially infected pairs are constants, which turns the edges out of them into
+# x[t, v] + y[v] >= 1. A node that is unreachable in every topology saves nothing, so its
+# y is fixed to 0 (no column) and the budget is capped by the number of remaining nodes;
+# vaccination never hurts, so the optimum is unchanged.
+#
+# Deduplication: topologies that are identical once restricted to their reachable pairs
+# give identical blocks, so each distinct restricted topology is modelled once and
+# weighted by the number of topologies it stands for, which keeps the same optimum.
+
+
+def deduplicate_topologies(parents, infected_idx, block_size=None):
+    # Returns (distinct, counts, inverse): the distinct topologies restricted to their
+    # reachable non-seed pairs (every other parent is -1), how many topologies each one
+    # stands for, and the distinct row of every topology. Rows are keyed by their bytes,
+    # so equal keys are equal rows.
+    num_topologies, num_nodes = parents.shape
+    block_size = max(1, (1 << 22) // max(num_nodes, 1)) if block_size is None else block_size
+    is_seed = np.zeros(num_nodes, dtype=bool)
+    is_seed[np.asarray(infected_idx, dtype=np.int64)] = True
+    index_of = {}
+    inverse = np.empty(num_topologies, dtype=np.int64)
+    for start in range(0, num_topologies, block_size):
+        block = np.asarray(parents[start:start + block_size])
+        mask = infected_mask(block, infected_idx)
+        mask[:, is_seed] = False
+        restricted = np.where(mask, block, -1).astype(np.int32)
+        for offset, row in enumerate(restricted):
+            inverse[start + offset] = index_of.setdefault(row.tobytes(), len(index_of))
+    distinct = np.array([np.frombuffer(key, dtype=np.int32) for key in index_of]).reshape(len(index_of), num_nodes)
+    return distinct, np.bincount(inverse, minlength=len(index_of)), inverse
+
+def vaccination_problem(parents, infected_idx, budget, exact=False, weights=None, presolve=True, deduplicate=True):
+    # Returns the problem min objective @ v + constant subject to matrix @ v >= rhs,
+    # budget_row @ v = budget and lower <= v <= upper (integral where integrality is 1),
+    # plus "pairs", "candidates", "column_of", "num_pairs", "num_topologies", "num_nodes"
+    # and "topology_of". Columns [0, num_pairs) are x, one per flat pair (t * N + v) in
+    # pairs, and the rest are y, one per node index in candidates (integral if exact);
+    # column_of[v] is v's column in y or -1. weights[t] multiplies topology t in the
+    # objective and defaults to 1. With deduplicate the blocks t are the distinct
+    # topologies and topology_of maps every input topology to its block.
+    parents = np.asarray(parents)
+    num_topologies, num_nodes = parents.shape
+    infected_idx = np.asarray(infected_idx, dtype=np.int64)
+    weights = np.ones(num_topologies) if weights is None else np.asarray(weights, dtype=float)
+    topology_of = np.arange(num_topologies)
+    # Size of the model without presolve and deduplication, for the log
+    full_variables, full_rows = num_topologies * num_nodes, int(np.count_nonzero(parents >= 0)) + 1
+    if deduplicate:
+        parents, _, topology_of = deduplicate_topologies(parents, infected_idx)
+        weights = np.bincount(topology_of, weights=weights, minlength=len(parents))
+        logging.info(f"Deduplicated {num_topologies} topologies into {len(parents)} distinct ones "
+                     f"(compression ratio {num_topologies / max(len(parents), 1):.2f})")
+        num_topologies = len(parents)
+    is_seed = np.zeros(num_nodes, dtype=bool)
+    is_seed[infected_idx] = True
+
+    if presolve:
+        pairs = infected_pairs(parents, infected_idx)
+        candidates = np.unique(pairs % num_nodes)
+    else:
+        candidates = np.flatnonzero(~is_seed)
+        pairs = (np.arange(num_topologies, dtype=np.int64)[:, None] * num_nodes + candidates).ravel()
+    column_of = np.full(num_nodes, -1, dtype=np.int64)
+    column_of[candidates] = np.arange(len(candidates))
+    model_budget = min(int(budget), len(candidates))
+
+    # One row per live edge into a pair with a column, in (topology, parent, child) order
+    child = pairs % num_nodes
+    parent = parents.ravel()[pairs].astype(np.int64)
+    has_parent = parent >= 0
+    child_columns, child, parent = np.flatnonzero(has_parent), child[has_parent], parent[has_parent]
+    topology = pairs[child_columns] // num_nodes
+    order = np.lexsort((child, parent, topology))
+    child_columns, child, parent, topology = child_columns[order], child[order], parent[order], topology[order]
+    # Without presolve a parent pair may have no column only if it is a seed
+    from_seed = is_seed[parent]
+    parent_columns = np.searchsorted(pairs, topology[~from_seed] * num_nodes + parent[~from_seed])
+
+    num_rows = len(child_columns)
+    row_index = np.arange(num_rows)
+    matrix = sp.csr_matrix((np.concatenate([np.ones(num_rows), -np.ones(len(parent_columns)), np.ones(num_rows)]),
+                            (np.concatenate([row_index, row_index[~from_seed], row_index]),
+                             np.concatenate([child_columns, parent_columns, len(pairs) + column_of[child]]))),
+                           shape=(num_rows, len(pairs) + len(candidates)))
+
+    logging.info(f"Removed {full_variables - len(pairs)} of {full_variables} "
+                 f"infection variables, {num_nodes - len(candidates)} of {num_nodes} vaccination variables "
+                 f"and {full_rows - num_rows - 1} of {full_rows} constraints")
+    if model_budget < budget:
+        logging.info(f"Budget capped at {model_budget}: only {len(candidates)} nodes are reachable")
+    num_columns = len(pairs) + len(candidates)
+    # Initially infected pairs are constant 1
+    return {"objective": np.r_[weights[pairs // num_nodes], np.zeros(len(candidates))],
+            "constant": float(weights.sum()) * len(infected_idx), "matrix": matrix, "rhs": from_seed.astype(float),
+            "budget_row": sp.csr_matrix((np.ones(len(candidates)), (np.zeros(len(candidates), dtype=np.int64),
+                                                                    np.arange(len(pairs), num_columns))),
+                                        shape=(1, num_columns)),
+            "budget": model_budget, "lower": np.zeros(num_columns), "upper": np.ones(num_columns),
+            "integrality": np.r_[np.zeros(len(pairs), dtype=np.int8), np.full(len(candidates), int(exact), dtype=np.int8)],
+            "pairs": pairs, "candidates": candidates, "column_of": column_of, "num_pairs": len(pairs),
+            "num_topologies": num_topologies, "num_nodes": num_nodes, "topology_of": topology_of}
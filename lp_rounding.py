@@ -0,0 +1,47 @@
+import logging
+
+import numpy as np
+
+from lp_solvers import set_bounds, solve, vaccination_order
+
+# Iterative rounding of the LP relaxation of lp_model.vaccination_problem on an
+# lp_solvers solver, as in LP_IRP.py: fix the vaccination of the highest-valued nodes to 1
+# and re-solve until the budget is used. Nodes are fixed by raising their lower bound
+# instead of adding equality rows, so the previous optimal basis stays valid (only primal
+# feasibility is lost) and the Gurobi backend restarts dual simplex from it. Each round
+# fixes the batch_size highest values and, with fix_integral, also every node that is
+# already at 1; nodes at 0 stay free.
+
+
+def iterative_rounding(solver, batch_size=1, fix_integral=False, tolerance=1e-6, log=logging.info):
+    # Returns {"indices", "scores", "score", "lp_objective", "rounds"}: the fixed node
+    # indices in the order they were fixed with their LP values at that time, the final
+    # objective, the objective of the relaxation and one {"fixed", "time", "objective",
+    # "drift", "iterations"} entry per re-solve (drift is the objective increase of the
+    # round). Ties (up to tolerance) go to the smallest node index, like the scan in LP_IRP.py.
+    problem = solver["problem"]
+    candidates, num_pairs = problem["candidates"], problem["num_pairs"]
+    if solver["values"] is None:
+        solve(solver)
+    lp_objective = objective = solver["objective"]
+    fixed = np.zeros(len(candidates), dtype=bool)
+    picks, scores, rounds = [], [], []
+    while len(picks) < problem["budget"]:
+        values = solver["values"][num_pairs:]
+        order = vaccination_order(np.where(fixed, -np.inf, values), tolerance)
+        count = batch_size
+        if fix_integral:
+            count = max(count, int(np.count_nonzero(~fixed & (values >= 1 - tolerance))))
+        chosen = order[:min(count, problem["budget"] - len(picks))]
+        fixed[chosen] = True
+        set_bounds(solver, num_pairs + chosen, lower=1.0)
+        picks.extend(candidates[chosen].tolist())
+        scores.extend(values[chosen].tolist())
+
+        solve(solver)
+        rounds.append({"fixed": len(chosen), "time": solver["time"], "objective": solver["objective"],
+                       "drift": solver["objective"] - objective, "iterations": solver["iterations"]})
+        objective = solver["objective"]
+        log(f"Round {len(rounds)}: fixed {len(chosen)} ({len(picks)} of {problem['budget']}), objective {objective}, "
+            f"drift {rounds[-1]['drift']}, {rounds[-1]['iterations']} simplex iterations, {solver['time']:.3f} seconds")
+    return {"indices": picks, "scores": scores, "score": objective, "lp_objective": lp_objective, "rounds": rounds}
@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, linprog, milp
+
+try:
+    import gurobipy as gp
+except ImportError:
+    gp = None
+
+# Backends that solve an lp_model.vaccination_problem. A solver is a dict holding the
+# problem and the current column bounds, and after a solve the column values, the
+# objective, the simplex iterations and the time of the last solve.
+#   "gurobi" builds one gurobipy model from the sparse matrices and re-solves it from the
+#            previous basis after bound changes.
+#   "highs"  needs no license: scipy's HiGHS (linprog for the LP, milp when columns are
+#            integral), from scratch on every solve.
+BACKENDS = ("gurobi", "highs")
+
+
+def default_backend():
+    return "gurobi" if gp is not None else "highs"
+
+def create_solver(problem, backend=None):
+    backend = default_backend() if backend is None else backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    solver = {"backend": backend, "problem": problem, "lower": problem["lower"].copy(),
+              "upper": problem["upper"].copy(), "values": None, "objective": None, "iterations": 0, "time": 0.0}
+    if backend == "gurobi":
+        if gp is None:
+            raise ImportError("The gurobi backend needs gurobipy; use backend='highs'")
+        model = gp.Model()
+        variables = model.addMVar(len(solver["lower"]), lb=solver["lower"], ub=solver["upper"],
+                                  vtype=np.where(problem["integrality"] == 1, gp.GRB.INTEGER, gp.GRB.CONTINUOUS))
+        model.setMObjective(None, problem["objective"], problem["constant"], xc=variables, sense=gp.GRB.MINIMIZE)
+        model.addMConstr(problem["budget_row"], variables, '=', np.array([float(problem["budget"])]))
+        model.addMConstr(problem["matrix"], variables, '>', problem["rhs"])
+        solver["model"], solver["variables"] = model, variables
+    return solver
+
+def set_bounds(solver, columns, lower=None, upper=None):
+    columns = np.asarray(columns, dtype=np.int64)
+    if lower is not None:
+        solver["lower"][columns] = lower
+    if upper is not None:
+        solver["upper"][columns] = upper
+    if solver["backend"] == "gurobi":
+        solver["variables"].LB = solver["lower"]
+        solver["variables"].UB = solver["upper"]
+        # The previous basis stays dual feasible after bound changes
+        solver["model"].Params.Method = 1
+
+def solve(solver):
+    # Solves the problem under the current bounds and returns the objective
+    problem = solver["problem"]
+    start_time = time.time()
+    if len(solver["lower"]) == 0:
+        # Nothing is reachable, scipy rejects an empty problem
+        values, objective, iterations = np.zeros(0), problem["constant"], 0
+    elif solver["backend"] == "gurobi":
+        model = solver["model"]
+        model.optimize()
+        if model.Status != gp.GRB.OPTIMAL:
+            raise RuntimeError(f"Gurobi stopped with status {model.Status}")
+        values, objective, iterations = solver["variables"].X, model.ObjVal, int(model.IterCount)
+    elif problem["integrality"].any():
+        result = milp(problem["objective"], integrality=problem["integrality"],
+                      bounds=Bounds(solver["lower"], solver["upper"]),
+                      constraints=[LinearConstraint(problem["matrix"], problem["rhs"], np.inf),
+                                   LinearConstraint(problem["budget_row"], problem["budget"], problem["budget"])])
+        if not result.success:
+            raise RuntimeError(f"HiGHS: {result.message}")
+        values, objective, iterations = result.x, result.fun + problem["constant"], 0
+    else:
+        result = linprog(problem["objective"], A_ub=-problem["matrix"], b_ub=-problem["rhs"],
+                         A_eq=problem["budget_row"], b_eq=np.array([float(problem["budget"])]),
+                         bounds=np.column_stack([solver["lower"], solver["upper"]]), method="highs")
+        if not result.success:
+            raise RuntimeError(f"HiGHS: {result.message}")
+        values, objective, iterations = result.x, result.fun + problem["constant"], int(result.nit)
+    solver.update(values=values, objective=objective, iterations=iterations, time=time.time() - start_time)
+    return objective
+
+def vaccination_values(solver):
+    # y of the last solve for every node index, 0 for the nodes presolve fixed
+    problem = solver["problem"]
+    values = np.zeros(problem["num_nodes"])
+    values[problem["candidates"]] = solver["values"][problem["num_pairs"]:]
+    return values
+
+def vaccination_order(values, tolerance=1e-6):
+    # Node indices by decreasing value; values equal up to round-off (tolerance) go by
+    # increasing node index, so the same solution is rounded alike on both backends
+    return np.argsort(-np.round(np.asarray(values) / tolerance), kind='stable')
@@ -0,0 +1,390 @@
+import io
+import sys
+
+import numpy as np
+
+# Binary graph container (.ltg). A 64 byte header is followed by five arrays, each
+# starting on an 8 byte boundary:
+#   nodes     int64[num_nodes]      node labels, sorted; position i is dense index i
+#   offsets   int64[num_nodes + 1]  CSR offsets of the outgoing edges of each node
+#   targets   int32[num_edges]      dense index of each edge's target
+#   weights   float32[num_edges]    LT weight of each edge
+#   infected  int64[num_infected]   labels of the initially infected nodes
+# NUM_INSTANCES / NUM_VACCINES are stored in the header (-1 when absent).
+MAGIC = b"LTGRAPH\0"
+VERSION = 1
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('version', '<u4'), ('reserved', '<u4'),
+                         ('num_nodes', '<u8'), ('num_edges', '<u8'), ('num_infected', '<u8'),
+                         ('num_instances', '<i8'), ('num_vaccines', '<i8')])
+BINARY_EXTENSION = ".ltg"
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+def _section_layout(num_nodes, num_edges, num_infected):
+    layout = {}
+    offset = HEADER_SIZE
+    for name, dtype, count in (("nodes", np.int64, num_nodes), ("offsets", np.int64, num_nodes + 1),
+                               ("targets", np.int32, num_edges), ("weights", np.float32, num_edges),
+                               ("infected", np.int64, num_infected)):
+        layout[name] = (offset, np.dtype(dtype), count)
+        offset = _aligned(offset + np.dtype(dtype).itemsize * count)
+    return layout
+
+def to_csr(num_nodes, sources, targets, weights):
+    # Sorts the edges by source (stable, so each node keeps its edge order)
+    order = np.argsort(sources, kind='stable')
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=offsets[1:])
+    return offsets, np.asarray(targets)[order], np.asarray(weights)[order]
+
+def csr_sources(offsets):
+    return np.repeat(np.arange(len(offsets) - 1, dtype=np.int32), np.diff(offsets))
+
+def is_binary_graph(filename):
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def write_graph_binary(filename, nodes, sources, targets, weights, infected, num_instances=None, num_vaccines=None):
+    # sources/targets are dense indices into nodes, infected are node labels
+    nodes = np.asarray(nodes, dtype=np.int64)
+    offsets, targets, weights = to_csr(len(nodes), np.asarray(sources), targets, weights)
+    infected = np.asarray(infected, dtype=np.int64)
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['num_nodes'] = len(nodes)
+    header['num_edges'] = len(targets)
+    header['num_infected'] = len(infected)
+    header['num_instances'] = -1 if num_instances is None else int(num_instances)
+    header['num_vaccines'] = -1 if num_vaccines is None else int(num_vaccines)
+
+    layout = _section_layout(len(nodes), len(targets), len(infected))
+    sections = {"nodes": nodes, "offsets": offsets, "targets": targets, "weights": weights, "infected": infected}
+    with open(filename, 'wb') as f:
+        f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+        for name, (offset, dtype, _) in layout.items():
+            f.write(b"\0" * (offset - f.tell()))
+            np.ascontiguousarray(sections[name], dtype=dtype).tofile(f)
+
+def read_graph_binary(filename):
+    # Every array is a read-only np.memmap into the file; nothing is copied
+    header = np.fromfile(filename, dtype=HEADER_DTYPE, count=1)[0]
+    if header['magic'] != MAGIC.rstrip(b"\0") or header['version'] != VERSION:
+        raise ValueError(f"{filename} is not a version {VERSION} binary LT graph")
+
+    data = {}
+    layout = _section_layout(int(header['num_nodes']), int(header['num_edges']), int(header['num_infected']))
+    for name, (offset, dtype, count) in layout.items():
+        if count == 0:
+            data[name] = np.empty(0, dtype=dtype)
+        else:
+            data[name] = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    data["num_instances"] = None if header['num_instances'] < 0 else int(header['num_instances'])
+    data["num_vaccines"] = None if header['num_vaccines'] < 0 else int(header['num_vaccines'])
+    return data
+
+def write_graph_text(filename, nodes, sources, targets, weights, infected, num_instances=None, num_vaccines=None):
+    # INFECTED_NODE/NODE/EDGE/NUM_INSTANCES/NUM_VACCINES format read by the C++ programs
+    write_graph_text_chunks(filename, nodes, [(sources, targets, weights)], infected, num_instances, num_vaccines)
+
+def write_graph_text_chunks(filename, nodes, edge_chunks, infected, num_instances=None, num_vaccines=None):
+    # write_graph_text with the edges given as an iterable of (sources, targets, weights)
+    # chunks, written as they come
+    nodes = np.asarray(nodes)
+    with open(filename, "w") as file:
+        file.writelines(f"INFECTED_NODE {node}\n" for node in np.asarray(infected).tolist())
+        file.writelines(f"NODE {n}\n" for n in nodes.tolist())
+        for sources, targets, weights in edge_chunks:
+            file.writelines(f"EDGE {u} {v} {w:.5f}\n" for u, v, w in
+                            zip(nodes[sources].tolist(), nodes[targets].tolist(), np.asarray(weights).tolist()))
+        if num_instances is not None:
+            file.write(f"NUM_INSTANCES {num_instances}\n")
+        if num_vaccines is not None:
+            file.write(f"NUM_VACCINES {num_vaccines}\n")
+
+def write_graph_binary_chunks(filename, nodes, edge_chunks, out_degrees, infected, num_instances=None, num_vaccines=None):
+    # write_graph_binary with the edges given as an iterable of (sources, targets, weights)
+    # chunks. The CSR offsets come from out_degrees (the number of edges of every source
+    # over all chunks), so the file is laid out up front and every chunk is written
+    # straight into its targets/weights sections, after the earlier edges of each source.
+    nodes = np.asarray(nodes, dtype=np.int64)
+    infected = np.asarray(infected, dtype=np.int64)
+    offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+    np.cumsum(out_degrees, out=offsets[1:])
+    num_edges = int(offsets[-1])
+
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = MAGIC
+    header['version'] = VERSION
+    header['num_nodes'] = len(nodes)
+    header['num_edges'] = num_edges
+    header['num_infected'] = len(infected)
+    header['num_instances'] = -1 if num_instances is None else int(num_instances)
+    header['num_vaccines'] = -1 if num_vaccines is None else int(num_vaccines)
+
+    layout = _section_layout(len(nodes), num_edges, len(infected))
+    with open(filename, 'wb') as f:
+        f.write(header.tobytes().ljust(HEADER_SIZE, b"\0"))
+        for name, array in (("nodes", nodes), ("offsets", offsets), ("infected", infected)):
+            offset, dtype, _ = layout[name]
+            f.seek(offset)
+            np.ascontiguousarray(array, dtype=dtype).tofile(f)
+        # The edge sections in between are filled below
+        f.truncate(layout["infected"][0] + infected.nbytes)
+
+    next_edge = offsets[:-1].copy()
+    if num_edges:
+        sections = {name: np.memmap(filename, dtype=layout[name][1], mode='r+', offset=layout[name][0], shape=(num_edges,))
+                    for name in ("targets", "weights")}
+    for sources, targets, weights in edge_chunks:
+        sources = np.asarray(sources, dtype=np.int64)
+        order = np.argsort(sources, kind='stable')
+        sorted_sources = sources[order]
+        # Rank of every edge among the chunk's edges with the same source
+        ranks = np.arange(len(order)) - np.searchsorted(sorted_sources, sorted_sources)
+        positions = next_edge[sorted_sources] + ranks
+        if len(positions) and (positions >= offsets[sorted_sources + 1]).any():
+            raise ValueError(f"{filename}: the edge chunks have more edges than out_degrees")
+        sections["targets"][positions] = np.asarray(targets)[order]
+        sections["weights"][positions] = np.asarray(weights)[order]
+        next_edge += np.bincount(sources, minlength=len(nodes))
+    if not np.array_equal(next_edge, offsets[1:]):
+        raise ValueError(f"{filename}: the edge chunks have fewer edges than out_degrees")
+    if num_edges:
+        for section in sections.values():
+            section.flush()
+
+def write_graph(filename, nodes, sources, targets, weights, infected, num_instances=None, num_vaccines=None):
+    writer = write_graph_binary if filename.endswith(BINARY_EXTENSION) else write_graph_text
+    writer(filename, nodes, sources, targets, weights, infected, num_instances, num_vaccines)
+
+def write_graph_chunks(filename, nodes, edge_chunks, out_degrees, infected, num_instances=None, num_vaccines=None):
+    # write_graph for graphs whose edges do not fit in memory at once
+    if filename.endswith(BINARY_EXTENSION):
+        write_graph_binary_chunks(filename, nodes, edge_chunks, out_degrees, infected, num_instances, num_vaccines)
+    else:
+        write_graph_text_chunks(filename, nodes, edge_chunks, infected, num_instances, num_vaccines)
+
+TEXT_KEYWORDS = {b"INFECTED_NODE": 0, b"NODE": 1, b"EDGE": 2, b"NUM_INSTANCES": 3, b"NUM_VACCINES": 4}
+INFECTED_NODE, NODE, EDGE, NUM_INSTANCES, NUM_VACCINES = range(5)
+KEYWORD_ARGS = np.array([1, 1, 3, 1, 1])
+POWERS_OF_TEN = 10 ** np.arange(19, dtype=np.int64)
+
+
+def _iter_line_chunks(filename, chunk_size):
+    # Blocks of about chunk_size bytes, each ending at a line boundary
+    with open(filename, 'rb') as f:
+        rest = b""
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            block = rest + block
+            cut = block.rfind(b"\n") + 1
+            if cut == 0:
+                rest = block
+                continue
+            yield block[:cut]
+            rest = block[cut:]
+        if rest.strip():
+            yield rest + b"\n"
+
+def _parse_numbers(buf, b, is_sep, starts, ends):
+    # Parses every token of the chunk as a decimal number at once: each digit byte
+    # contributes digit * 10^(digits after it in the token) and np.add.reduceat sums
+    # those per token. Returns (mantissa, decimals): value = mantissa / 10^decimals.
+    if len(starts) == 0:
+        # Only whitespace, e.g. trailing blank lines alone in the last chunk
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    is_digit = (b >= 48) & (b <= 57)
+    digits_seen = np.cumsum(is_digit, dtype=np.int32)
+    start_marks = np.zeros(len(b), dtype=np.int32)
+    start_marks[starts] = 1
+    token_of_byte = np.cumsum(start_marks) - 1
+    token_digits_end = digits_seen[ends - 1]
+    num_digits = token_digits_end - np.where(starts > 0, digits_seen[starts - 1], 0)
+
+    exponent = token_digits_end[token_of_byte] - digits_seen
+    contributions = np.where(is_digit, (b - 48).astype(np.int64) * POWERS_OF_TEN[np.clip(exponent, 0, 18)], 0)
+    mantissa = np.add.reduceat(contributions, starts)
+    mantissa[b[starts] == 45] *= -1
+
+    decimals = np.zeros(len(starts), dtype=np.int64)
+    dots = np.flatnonzero(b == 46)
+    decimals[token_of_byte[dots]] = token_digits_end[token_of_byte[dots]] - digits_seen[dots]
+
+    # Tokens this does not cover (exponents, a '-' after the first byte, several dots,
+    # more than 18 digits) go through float(), which also rejects malformed ones such as
+    # 1-2 or 1.2.3
+    other_bytes = np.add.reduceat((~is_sep & ~is_digit).astype(np.int32), starts)
+    minus_signs = np.add.reduceat((b == 45).astype(np.int32), starts) - (b[starts] == 45)
+    num_dots = np.add.reduceat((b == 46).astype(np.int32), starts)
+    numeric = b[starts] < 65
+    irregular = (other_bytes > minus_signs + num_dots + (b[starts] == 45)) | (minus_signs > 0) | (num_dots > 1)
+    for t in np.flatnonzero(numeric & (irregular | (num_digits > 18))):
+        token = buf[starts[t]:ends[t]]
+        try:
+            value = float(token)
+        except ValueError:
+            raise ValueError(f"Invalid input: malformed number {token!r}") from None
+        mantissa[t], decimals[t] = (int(value), 0) if value.is_integer() else (round(value * 1e9), 9)
+    return mantissa, decimals
+
+EDGE_ROW_DTYPE = np.dtype([('u', np.int64), ('v', np.int64), ('w', np.float32)])
+
+
+def _parse_uniform_chunk(buf):
+    # Generator output keeps each line type in one contiguous section, so almost every
+    # chunk holds only EDGE (or only NODE) lines; those go straight through NumPy's C
+    # tokenizer. Returns None for any other chunk.
+    num_lines = buf.count(b"\n")
+    empty = np.empty(0, dtype=np.int64)
+    parsed = {"infected": empty, "nodes": empty, "sources": empty, "targets": empty,
+              "weights": np.empty(0, dtype=np.float32), "num_instances": empty, "num_vaccines": empty}
+    try:
+        if buf.startswith(b"EDGE ") and buf.count(b"EDGE") == num_lines:
+            rows = np.loadtxt(io.BytesIO(buf), usecols=(1, 2, 3), dtype=EDGE_ROW_DTYPE, comments=None, ndmin=1)
+            parsed.update(sources=rows['u'], targets=rows['v'], weights=rows['w'])
+            return parsed
+        if buf.startswith(b"NODE ") and buf.count(b"NODE ") == num_lines and b"INFECTED" not in buf:
+            parsed["nodes"] = np.loadtxt(io.BytesIO(buf), usecols=1, dtype=np.int64, comments=None, ndmin=1)
+            return parsed
+    except ValueError:
+        # Malformed line somewhere: the general parser reports it
+        pass
+    return None
+
+def _parse_chunk(buf):
+    parsed = _parse_uniform_chunk(buf)
+    if parsed is not None:
+        return parsed
+
+    b = np.frombuffer(buf, dtype=np.uint8)
+    is_sep = b <= 32
+    transitions = np.diff(np.r_[0, (~is_sep).view(np.int8), 0])
+    starts = np.flatnonzero(transitions == 1)
+    ends = np.flatnonzero(transitions == -1)
+
+    # Keywords are the tokens starting with a letter; each one opens a line
+    keyword_tokens = np.flatnonzero(b[starts] >= 65)
+    if len(starts) and (len(keyword_tokens) == 0 or keyword_tokens[0] != 0):
+        raise ValueError(f"Invalid input: {buf.split(maxsplit=1)[0]!r}")
+    kw_starts = starts[keyword_tokens]
+    kinds = np.full(len(keyword_tokens), EDGE)
+    is_edge = (ends[keyword_tokens] - kw_starts == 4) & (b[kw_starts] == 69) & (b[kw_starts + 1] == 68) \
+        & (b[kw_starts + 2] == 71) & (b[kw_starts + 3] == 69)
+    for i in np.flatnonzero(~is_edge):
+        keyword = buf[kw_starts[i]:ends[keyword_tokens[i]]]
+        if keyword not in TEXT_KEYWORDS:
+            raise ValueError(f"Invalid input: {keyword!r}")
+        kinds[i] = TEXT_KEYWORDS[keyword]
+    num_args = np.diff(np.r_[keyword_tokens, len(starts)]) - 1
+    if np.any(num_args != KEYWORD_ARGS[kinds]):
+        bad = np.flatnonzero(num_args != KEYWORD_ARGS[kinds])[0]
+        line = buf[kw_starts[bad]:].splitlines()[0]
+        raise ValueError(f"Invalid input: {line!r}")
+
+    mantissa, decimals = _parse_numbers(buf, b, is_sep, starts, ends)
+    values = mantissa / 10.0 ** decimals
+
+    def labels(kind, offset):
+        tokens = keyword_tokens[kinds == kind] + offset
+        if np.any(decimals[tokens] != 0):
+            raise ValueError("Invalid input: node labels must be integers")
+        return mantissa[tokens]
+
+    edge_tokens = keyword_tokens[kinds == EDGE]
+    return {"infected": labels(INFECTED_NODE, 1), "nodes": labels(NODE, 1),
+            "sources": labels(EDGE, 1), "targets": labels(EDGE, 2),
+            "weights": values[edge_tokens + 3].astype(np.float32),
+            "num_instances": labels(NUM_INSTANCES, 1), "num_vaccines": labels(NUM_VACCINES, 1)}
+
+def _dense_index(nodes, sources, targets):
+    # Node labels: every NODE line plus every edge endpoint, sorted. Small non-negative
+    # labels (the generators use 0..n-1) are mapped with a lookup table instead of a sort.
+    largest = max((int(a.max()) for a in (nodes, sources, targets) if len(a)), default=-1)
+    smallest = min((int(a.min()) for a in (nodes, sources, targets) if len(a)), default=0)
+    if smallest >= 0 and largest < 4 * (len(nodes) + len(sources)) + 1024:
+        present = np.zeros(largest + 1, dtype=bool)
+        for a in (nodes, sources, targets):
+            present[a] = True
+        lookup = np.cumsum(present, dtype=np.int64) - 1
+        return np.flatnonzero(present).astype(np.int64), lookup[sources], lookup[targets].astype(np.int32)
+    labels = np.unique(np.concatenate([nodes, sources, targets]))
+    return labels, np.searchsorted(labels, sources), np.searchsorted(labels, targets).astype(np.int32)
+
+def read_graph_text(filename, chunk_size=1 << 22):
+    # Reads the text format chunk by chunk and tokenizes each chunk with NumPy. Peak
+    # memory is a small multiple of chunk_size plus about 40 bytes per edge for the
+    # result (see measure_read).
+    parts = {key: [] for key in ("infected", "nodes", "sources", "targets", "weights", "num_instances", "num_vaccines")}
+    for buf in _iter_line_chunks(filename, chunk_size):
+        for key, value in _parse_chunk(buf).items():
+            parts[key].append(value)
+    columns = {key: np.concatenate(value) if value else np.empty(0, dtype=np.int64) for key, value in parts.items()}
+    num_instances = int(columns["num_instances"][-1]) if len(columns["num_instances"]) else None
+    num_vaccines = int(columns["num_vaccines"][-1]) if len(columns["num_vaccines"]) else None
+    del parts
+
+    # Zero weight edges are dropped, but their endpoints still count as nodes
+    nodes, sources, targets = _dense_index(columns["nodes"], columns["sources"], columns["targets"])
+    weights = columns["weights"].astype(np.float32)
+    keep = weights != 0
+    if not np.all(keep):
+        sources, targets, weights = sources[keep], targets[keep], weights[keep]
+    offsets, targets, weights = to_csr(len(nodes), sources, targets, weights)
+    return {"nodes": nodes, "offsets": offsets, "targets": targets, "weights": weights,
+            "infected": columns["infected"].astype(np.int64),
+            "num_instances": num_instances, "num_vaccines": num_vaccines}
+
+def read_graph(filename):
+    return read_graph_binary(filename) if is_binary_graph(filename) else read_graph_text(filename)
+
+def text_to_binary(text_filename, binary_filename):
+    data = read_graph_text(text_filename)
+    write_graph_binary(binary_filename, data["nodes"], csr_sources(data["offsets"]), data["targets"],
+                       data["weights"], data["infected"], data["num_instances"], data["num_vaccines"])
+
+def binary_to_text(binary_filename, text_filename):
+    data = read_graph_binary(binary_filename)
+    write_graph_text(text_filename, data["nodes"], csr_sources(data["offsets"]), data["targets"],
+                     data["weights"], data["infected"], data["num_instances"], data["num_vaccines"])
+
+
+def measure_read(filename):
+    # Wall time and peak resident memory (bytes) of read_graph in a fresh process, so the
+    # peak is not hidden by memory the caller already used
+    import multiprocessing
+
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure_read_worker, (filename,))
+
+def _measure_read_worker(filename):
+    import resource
+    import time
+
+    start_time = time.time()
+    data = read_graph(filename)
+    elapsed = time.time() - start_time
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return len(data["nodes"]), len(data["targets"]), elapsed, peak
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "stats":
+        num_nodes, num_edges, elapsed, peak = measure_read(sys.argv[2])
+        print(f"{num_nodes} nodes, {num_edges} edges read in {elapsed:.2f} seconds, peak memory {peak / 2**20:.1f} MiB")
+        sys.exit(0)
+    if len(sys.argv) != 4 or sys.argv[1] not in ("to-binary", "to-text"):
+        print(f"Usage: {sys.argv[0]} to-binary|to-text <input graph> <output graph>")
+        print(f"       {sys.argv[0]} stats <graph>")
+        sys.exit(1)
+    if sys.argv[1] == "to-binary":
+        text_to_binary(sys.argv[2], sys.argv[3])
+    else:
+        binary_to_text(sys.argv[2], sys.argv[3])
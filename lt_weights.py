@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def normalize_incoming_weights(targets, rng=None, decimals=5):
+    # Draws a uniform raw weight per edge and divides it by 1.1 times the sum of the raw
+    # weights entering the same target, so every node's incoming weights sum to 1/1.1.
+    # Edges are grouped by target with one stable sort and the per-target sums are
+    # segmented sums (np.add.reduceat); the result is aligned with `targets`.
+    #
+    # The graph files store weights with `decimals` digits. Weights are floored (not
+    # rounded) to that precision, so the sums read back by LinearThresholdNetwork::isValidNetwork
+    # can never exceed 1, however many incoming edges a node has.
+    rng = np.random.default_rng() if rng is None else rng
+    targets = np.asarray(targets)
+    weights = np.empty(len(targets), dtype=np.float64)
+    if len(targets) == 0:
+        return weights
+
+    order = np.argsort(targets, kind='stable')
+    sorted_targets = targets[order]
+    starts = np.flatnonzero(np.r_[True, sorted_targets[1:] != sorted_targets[:-1]])
+    counts = np.diff(np.r_[starts, len(targets)])
+
+    # Raw weights are drawn directly in target order
+    raw_weights = rng.random(len(targets))
+    total_raw_weights = np.add.reduceat(raw_weights, starts) * 1.1
+    weights[order] = raw_weights / np.repeat(total_raw_weights, counts)
+
+    return _floor_weights(weights, decimals)
+
+def scale_incoming_weights(raw_weights, targets, raw_sums, decimals=5):
+    # normalize_incoming_weights for edges that are streamed in chunks: the caller draws
+    # the raw weights and passes raw_sums, the sums of the raw weights entering every node
+    # over all chunks
+    return _floor_weights(raw_weights / (1.1 * raw_sums[targets]), decimals)
+
+def _floor_weights(weights, decimals):
+    if decimals is not None:
+        scale = 10 ** decimals
+        weights = np.floor(weights * scale) / scale
+    return weights
+
+def incoming_weight_sums(targets, weights, num_nodes):
+    return np.bincount(targets, weights=weights, minlength=num_nodes)
+
+def is_valid_network(targets, weights, num_nodes):
+    # Python counterpart of LinearThresholdNetwork::isValidNetwork
+    return bool(np.all(incoming_weight_sums(targets, weights, num_nodes) <= 1))
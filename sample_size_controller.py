@@ -0,0 +1,95 @@
+import time
+
+import numpy as np
+from scipy import stats
+
+from greedy_vaccination import greedy_vaccination
+from live_edge import sample_graph_parents
+from local_search import swap_local_search
+from topology_eval import count_infected
+from topology_store import node_indices
+
+# Sample average approximation for the number of live-edge topologies, in place of the
+# randomized bisection of getOptimumNumInstances. The sample grows batch_size topologies
+# at a time and is re-solved after every batch. The solutions before and after a batch are
+# compared on a fresh validation batch, paired per topology: the mean difference of their
+# infected counts estimates how much the larger sample still improved the solution. Once
+# the whole confidence interval of that gap is within tolerance (relative to the infected
+# count of the new solution), a larger sample is not worth paying for.
+
+
+def solve_greedy(parents, infected_idx, budget, nodes):
+    return greedy_vaccination(parents, infected_idx, budget, nodes, lazy=True)["indices"]
+
+def solve_local_search(parents, infected_idx, budget, nodes):
+    # Greedy followed by swap local search, what getOptimumNumInstances re-runs
+    initial = greedy_vaccination(parents, infected_idx, budget, nodes, lazy=True)["indices"]
+    return swap_local_search(parents, infected_idx, initial, nodes, log=lambda message: None)["indices"]
+
+def paired_gap(validation, infected_idx, previous, current, confidence=0.95):
+    # Mean and confidence interval of the per topology difference in infected nodes
+    # between the previous and the current solution (positive: current is better), and
+    # the mean infected count of the current solution
+    current_counts = count_infected(validation, infected_idx, current)[1]
+    differences = count_infected(validation, infected_idx, previous)[1] - current_counts
+    current_mean = float(current_counts.mean())
+    mean = float(differences.mean())
+    if len(differences) < 2:
+        return mean, -np.inf, np.inf, current_mean
+    half_width = stats.t.ppf((1 + confidence) / 2, len(differences) - 1) * differences.std(ddof=1) / np.sqrt(len(differences))
+    return mean, mean - half_width, mean + half_width, current_mean
+
+def choose_sample_size(graph_data, budget, batch_size=100, max_instances=1000, tolerance=0.01, confidence=0.95,
+                       solve=solve_greedy, rng=None, log=print):
+    # Returns {"parents" (the chosen sample), "solution" (node indices), "num_instances",
+    # "converged", "rounds" [{"num_instances", "gap", "low", "high", "infected", "time"}]}
+    rng = np.random.default_rng(rng)
+    nodes = np.asarray(graph_data["nodes"])
+    infected_idx = node_indices(nodes, graph_data["infected"])
+    parents = sample_graph_parents(graph_data, batch_size, rng)
+    solution = solve(parents, infected_idx, budget, nodes)
+    rounds, converged = [], False
+    while len(parents) + batch_size <= max_instances:
+        start_time = time.time()
+        parents = np.concatenate([parents, sample_graph_parents(graph_data, batch_size, rng)])
+        previous, solution = solution, solve(parents, infected_idx, budget, nodes)
+        validation = sample_graph_parents(graph_data, batch_size, rng)
+        gap, low, high, infected = paired_gap(validation, infected_idx, previous, solution, confidence)
+        rounds.append({"num_instances": len(parents), "gap": gap, "low": low, "high": high, "infected": infected,
+                       "time": time.time() - start_time})
+        log(f"{len(parents)} instances: gap {gap:.3f} infected per topology ({confidence:.0%} CI {low:.3f} to "
+            f"{high:.3f}), {infected:.3f} infected, {rounds[-1]['time']:.3f} seconds")
+        if max(abs(low), abs(high)) <= tolerance * infected:
+            converged = True
+            break
+    return {"parents": parents, "solution": solution, "num_instances": len(parents), "converged": converged,
+            "rounds": rounds}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from lt_graph_io import read_graph
+    from topology_store import write_topology_store
+
+    parser = argparse.ArgumentParser(description="Grow the number of sampled topologies until the solution settles.")
+    parser.add_argument("graph")
+    parser.add_argument("store", nargs="?", help="write the chosen sample as a topology store with this prefix")
+    parser.add_argument("--num-vaccines", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-instances", type=int, default=1000)
+    parser.add_argument("--tolerance", type=float, default=0.01, help="relative to the infected count")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--solver", choices=["greedy", "local_search"], default="greedy")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    graph_data = read_graph(args.graph)
+    budget = graph_data["num_vaccines"] if args.num_vaccines is None else args.num_vaccines
+    result = choose_sample_size(graph_data, budget, args.batch_size, args.max_instances, args.tolerance,
+                                args.confidence, solve_greedy if args.solver == "greedy" else solve_local_search,
+                                args.seed)
+    print(f"{result['num_instances']} instances" + ("" if result["converged"] else " (max instances reached)"))
+    print(" ".join(map(str, np.asarray(graph_data["nodes"])[result["solution"]].tolist())))
+    if args.store:
+        write_topology_store(args.store, result["parents"], graph_data["nodes"], graph_data["infected"])
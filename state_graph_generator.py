@@ -0,0 +1,176 @@
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from city_cache import ensure_city_cache, load_state_cities
+from LT_generate_waxman_gaussian import convex_hull_diameter, waxman_edges_blocked
+from lt_graph_io import BINARY_EXTENSION, write_graph
+from lt_weights import normalize_incoming_weights
+
+
+def get_box(cities):
+    # Longitudes are mapped to [1/4, 3/4] of a box of length 1 and latitudes are scaled
+    # by the same factor, so the state keeps its aspect ratio.
+    min_lat, max_lat = cities["lat"].min(), cities["lat"].max()
+    min_lon, max_lon = cities["lng"].min(), cities["lng"].max()
+    M = max_lon - min_lon
+    height = max_lat - min_lat
+    # A single city (DC) or cities on one line cannot be scaled into a box
+    if M <= 0 or height <= 0:
+        raise ValueError(f"the cities span {M} degrees of longitude and {height} of latitude, a box needs both")
+    new_length = 1
+    new_breadth = 2 * height / (M / 0.5)
+    return {"min_lat": min_lat, "min_lon": min_lon, "M": M, "height": height,
+            "length": new_length, "breadth": new_breadth}
+
+def scale_to_box(latitudes, longitudes, box):
+    scaled_longitudes = 0.5 * (longitudes - box["min_lon"]) / box["M"] + box["length"] / 4
+    scaled_latitudes = (latitudes - box["min_lat"]) / box["height"] * (box["breadth"] / 2) + box["breadth"] / 4
+    return scaled_latitudes, scaled_longitudes
+
+def sample_city_points(cities, box, population_scale, std_dev_scaling_factor, rng=None):
+    # Every city contributes population / population_scale points drawn from a Gaussian
+    # around it; all cities are sampled in one draw by repeating the per-city parameters.
+    rng = np.random.default_rng() if rng is None else rng
+    # A city without a density has no spread, so it gets no points
+    has_density = cities["density"] > 0
+    if not has_density.all():
+        logging.warning(f"{int((~has_density).sum())} cities without a density are left out")
+    sampling_population = np.where(has_density, cities["population"] / int(population_scale), 0).astype(int)
+    area = np.where(has_density, cities["population"] / np.where(has_density, cities["density"], 1), 0)
+    std_deviation = np.sqrt(area / np.pi) / (3 * box["M"] * float(std_dev_scaling_factor))
+
+    scale = np.repeat(std_deviation, sampling_population)
+    sampled_latitudes = rng.normal(loc=np.repeat(cities["lat"], sampling_population), scale=scale)
+    sampled_longitudes = rng.normal(loc=np.repeat(cities["lng"], sampling_population), scale=scale)
+
+    scaled_latitudes, scaled_longitudes = scale_to_box(sampled_latitudes, sampled_longitudes, box)
+    # (lat, lon) rows, as in the original per-city sampling loop
+    return np.column_stack([np.clip(scaled_latitudes, 0, box["breadth"]),
+                            np.clip(scaled_longitudes, 0, box["length"])])
+
+def generate_state_graph(state_id, population_scale, std_dev_scaling_factor, alpha, beta, infected_ratio,
+                         num_instances, vaccine_ratio=None, filename=None, output_dir=".", file_path='uscities.xlsx',
+                         points=None, binary=False, rng=None):
+    rng = np.random.default_rng() if rng is None else rng
+    # The interactive scripts always used the infected ratio for NUM_VACCINES
+    vaccine_ratio = infected_ratio if vaccine_ratio is None else vaccine_ratio
+    # Created before the simulation so a bad --output-dir fails before the work is done
+    os.makedirs(output_dir if filename is None else os.path.dirname(filename) or ".", exist_ok=True)
+
+    if points is None:
+        cities = load_state_cities(state_id, file_path)
+        box = get_box(cities)
+        points = sample_city_points(cities, box, population_scale, std_dev_scaling_factor, rng)
+    num_nodes = len(points)
+    if num_nodes == 0:
+        raise ValueError(f"{state_id}: no points were sampled (population_scale {population_scale} is too large)")
+
+    L = convex_hull_diameter(points)
+    sources, targets = waxman_edges_blocked(points, L, float(alpha), float(beta), rng=rng)
+
+    # Every undirected Waxman edge becomes a pair of directed edges
+    sources, targets = np.concatenate([sources, targets]), np.concatenate([targets, sources])
+    weights = normalize_incoming_weights(targets, rng)
+
+    infected_nodes = rng.choice(num_nodes, max(1, int(float(infected_ratio) * num_nodes)), replace=False)
+    num_vaccines = int(num_nodes * float(vaccine_ratio))
+    if filename is None:
+        filename = os.path.join(output_dir, f"LT_{state_id}_{num_nodes}_{num_vaccines}_{num_instances}" + (BINARY_EXTENSION if binary else ".txt"))
+
+    write_graph(filename, np.arange(num_nodes), sources, targets, weights, infected_nodes, num_instances, num_vaccines)
+
+    print(f"{state_id}: {num_nodes} nodes, {len(sources)} edges, output in {filename}")
+    return filename
+
+def _generate_state_graph_worker(args):
+    # A state whose cities cannot be sampled is reported instead of failing the batch
+    state_id, params = args
+    try:
+        return state_id, generate_state_graph(state_id, **params), None
+    except ValueError as error:
+        return state_id, None, str(error)
+
+def generate_all_states(state_ids=None, max_workers=None, file_path='uscities.xlsx', **params):
+    # Generates one graph per state in a process pool; returns {state_id: filename} of the
+    # states that could be generated, the others are logged and skipped
+    # The city cache is (re)built here once so the workers only read from it
+    manifest = ensure_city_cache(file_path)
+    if state_ids is None:
+        state_ids = manifest["states"]
+    jobs = [(state_id, dict(params, file_path=file_path)) for state_id in state_ids]
+    os.makedirs(params.get("output_dir", "."), exist_ok=True)
+
+    filenames = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        for state_id, filename, error in executor.map(_generate_state_graph_worker, jobs):
+            if error is None:
+                filenames[state_id] = filename
+            else:
+                logging.warning(f"{state_id} skipped: {error}")
+    return filenames
+
+def plot_state_points(cities, box, points, title):
+    import matplotlib.pyplot as plt
+
+    scaled_latitudes, scaled_longitudes = scale_to_box(cities["lat"], cities["lng"], box)
+    plt.figure(figsize=(10, 6))
+    plt.scatter(scaled_longitudes, scaled_latitudes, marker='o', color='red', label='Centers', s=10)
+    if points is not None:
+        plt.scatter(points[:, 1], points[:, 0], marker='x', color='blue', label='Sampled Points', s=10)
+    plt.xlim(0, box["length"])
+    plt.ylim(0, box["breadth"])
+    plt.xlabel('Normalized Longitude')
+    plt.ylabel('Normalized Latitude')
+    plt.title(title)
+    plt.legend()
+    plt.grid()
+    plt.show()
+
+def run_interactive(state_id, example_filename):
+    # Prompt-driven flow of the original per-state scripts
+    cities = load_state_cities(state_id)
+    box = get_box(cities)
+    print("Total population: ", cities["population"].sum())
+    plot_state_points(cities, box, None, f"Mapping of {state_id} Cities within a Rescaled Box")
+
+    scale = input(f"divide the population {cities['population'].sum()} by? ")
+    std_dev_scaling_factor = input("std_deviation scaling factor (in the formula np.sqrt(population / (density * np.pi)) / (3*M * factor))? ")
+    points = sample_city_points(cities, box, scale, std_dev_scaling_factor)
+    plot_state_points(cities, box, points, 'Sampled Points and Centers')
+
+    alpha = input("alpha (eg: 0.1) = ")
+    beta = input("beta (eg: 0.9) = ")
+    infected_ratio = input("infected_ratio (eg: 0.1) = ")
+    num_instances = input("num_instances (eg: 50) = ")
+    filename = input(f"filename (eg: {example_filename}): ")
+    generate_state_graph(state_id, scale, std_dev_scaling_factor, float(alpha), float(beta), float(infected_ratio),
+                         num_instances, filename=filename, points=points)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate LT contact graphs for US states without prompts.")
+    parser.add_argument("states", nargs="*", help="state ids (eg: NY TX); all states when omitted")
+    parser.add_argument("--population-scale", type=int, required=True)
+    parser.add_argument("--std-dev-scaling-factor", type=float, required=True)
+    parser.add_argument("--alpha", type=float, default=0.1)
+    parser.add_argument("--beta", type=float, default=0.9)
+    parser.add_argument("--infected-ratio", type=float, default=0.1)
+    parser.add_argument("--vaccine-ratio", type=float, default=None)
+    parser.add_argument("--num-instances", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--binary", action="store_true", help=f"write {BINARY_EXTENSION} binary graphs instead of text")
+    args = parser.parse_args()
+
+    params = dict(population_scale=args.population_scale, std_dev_scaling_factor=args.std_dev_scaling_factor,
+                  alpha=args.alpha, beta=args.beta, infected_ratio=args.infected_ratio,
+                  vaccine_ratio=args.vaccine_ratio, num_instances=args.num_instances, output_dir=args.output_dir,
+                  binary=args.binary)
+    if len(args.states) == 1:
+        generate_state_graph(args.states[0], **params)
+    else:
+        generate_all_states(args.states or None, max_workers=args.workers, **params)
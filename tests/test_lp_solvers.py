@@ -0,0 +1,51 @@
+import itertools
+
+import numpy as np
+import pytest
+
+import lp_solvers
+from lp_model import vaccination_problem
+from lp_solvers import create_solver, solve, vaccination_order
+from topology_eval import count_infected
+
+# Small instances shared by both backends: random parent matrices (cycles included) with
+# some repeated topologies so deduplication has work to do
+SEEDS = range(12)
+
+
+def random_instance(seed):
+    rng = np.random.default_rng(seed)
+    num_topologies, num_nodes = int(rng.integers(2, 8)), int(rng.integers(5, 16))
+    parents = rng.integers(-1, num_nodes, size=(num_topologies, num_nodes)).astype(np.int32)
+    parents[parents == np.arange(num_nodes)] = -1
+    parents[rng.random(parents.shape) < 0.3] = -1
+    parents[-1] = parents[0]
+    infected_idx = rng.choice(num_nodes, 2, replace=False)
+    return parents, infected_idx, int(rng.integers(1, num_nodes - 2))
+
+def solve_on(backend, parents, infected_idx, budget, exact):
+    solver = create_solver(vaccination_problem(parents, infected_idx, budget, exact), backend)
+    if backend == "gurobi":
+        solver["model"].Params.OutputFlag = 0
+    return solve(solver)
+
+@pytest.mark.skipif(lp_solvers.gp is None, reason="gurobipy is not installed")
+@pytest.mark.parametrize("exact", [False, True])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_backends_reach_the_same_objective(seed, exact):
+    parents, infected_idx, budget = random_instance(seed)
+    assert solve_on("gurobi", parents, infected_idx, budget, exact) == pytest.approx(
+        solve_on("highs", parents, infected_idx, budget, exact), abs=1e-6)
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_highs_ilp_matches_exhaustive_search(seed):
+    parents, infected_idx, budget = random_instance(seed)
+    budget = min(budget, 3)
+    others = np.setdiff1d(np.arange(parents.shape[1]), infected_idx)
+    best = min(count_infected(parents, infected_idx, list(subset))[0] for subset in itertools.combinations(others, budget))
+    assert solve_on("highs", parents, infected_idx, budget, True) == pytest.approx(best, abs=1e-6)
+    assert solve_on("highs", parents, infected_idx, budget, False) <= best + 1e-6
+
+def test_vaccination_order_breaks_round_off_ties_by_node():
+    values = np.array([0.5, 1.0, 0.5 + 1e-9, 0.5 - 1e-9, 0.0, 1.0 - 1e-10])
+    assert vaccination_order(values).tolist() == [1, 5, 0, 2, 3, 4]
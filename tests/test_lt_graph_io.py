@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from lt_graph_io import read_graph_text
+
+GRAPH_TEXT = "NUM_INSTANCES 4\nNODE 0\nNODE 1\nNODE 2\nINFECTED_NODE 0\nEDGE 0 1 0.5\nEDGE 1 2 0.25\n"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 8, 16, 1 << 22])
+def test_trailing_blank_lines_parse_as_empty(tmp_path, chunk_size):
+    filename = tmp_path / "graph.txt"
+    filename.write_text(GRAPH_TEXT + "\n" * 40 + "   \n\t\n\n")
+    graph = read_graph_text(str(filename), chunk_size=chunk_size)
+    assert graph["nodes"].tolist() == [0, 1, 2]
+    assert graph["infected"].tolist() == [0]
+    assert graph["offsets"].tolist() == [0, 1, 2, 2]
+    assert graph["targets"].tolist() == [1, 2]
+    assert np.allclose(graph["weights"], [0.5, 0.25])
+    assert graph["num_instances"] == 4
+
+
+@pytest.mark.parametrize("line", ["NODE 1-2", "INFECTED_NODE --1", "EDGE 0 1 1.2.3", "EDGE 0 1-2 0.5", "EDGE 0 1 0.5-"])
+@pytest.mark.parametrize("chunk_size", [16, 1 << 22])
+def test_malformed_numbers_are_rejected(tmp_path, line, chunk_size):
+    filename = tmp_path / "graph.txt"
+    filename.write_text(GRAPH_TEXT + line + "\n")
+    with pytest.raises(ValueError, match="Invalid input"):
+        read_graph_text(str(filename), chunk_size=chunk_size)
+
+
+def test_signs_exponents_and_leading_dots_still_parse(tmp_path):
+    filename = tmp_path / "graph.txt"
+    filename.write_text(GRAPH_TEXT + "NODE -7\nEDGE -7 2 .5\nEDGE 2 -7 2.5e-1\n")
+    graph = read_graph_text(str(filename))
+    assert graph["nodes"].tolist() == [-7, 0, 1, 2]
+    assert np.allclose(graph["weights"], [0.5, 0.5, 0.25, 0.25])
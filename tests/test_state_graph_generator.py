@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from state_graph_generator import get_box, sample_city_points
+
+
+def cities(lat, lng, population, density):
+    return {"lat": np.array(lat, dtype=float), "lng": np.array(lng, dtype=float),
+            "population": np.array(population, dtype=float), "density": np.array(density, dtype=float)}
+
+
+def test_single_city_has_no_box():
+    with pytest.raises(ValueError, match="a box needs both"):
+        get_box(cities([38.9], [-77.0], [5000], [4000]))
+
+
+def test_cities_without_density_get_no_points():
+    state = cities([40.0, 41.0, 42.0], [-75.0, -74.0, -73.0], [3000, 5000, 2000], [100, 0, 50])
+    with np.errstate(all="raise"):
+        points = sample_city_points(state, get_box(state), 100, 1, np.random.default_rng(0))
+    assert len(points) == 50 and np.isfinite(points).all()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from bench_topology_eval import deep_parents, get_infected, topology_dicts
+from greedy_vaccination import build_infected_forest, count_infected_in_forest
+from topology_eval import _reached_pairs, count_infected
+
+
+def random_parents(num_topologies, num_nodes, rng):
+    # Arbitrary parent pointers, so the topologies also have cycles and self loops
+    parents = rng.integers(-1, num_nodes, (num_topologies, num_nodes)).astype(np.int32)
+    parents[rng.random(parents.shape) < 0.3] = -1
+    return parents
+
+
+@pytest.mark.parametrize("make_parents", [random_parents, deep_parents])
+@pytest.mark.parametrize("max_levels", [0, 3, None])
+def test_walk_and_components_match_get_infected(make_parents, max_levels):
+    rng = np.random.default_rng(5)
+    parents = make_parents(300, 20, rng) if make_parents is deep_parents else make_parents(20, 300, rng)
+    num_topologies, num_nodes = parents.shape
+    infected_idx = rng.choice(num_nodes, 4, replace=False)
+    vaccinated_idx = rng.choice(np.setdiff1d(np.arange(num_nodes), infected_idx), 10, replace=False)
+    expected = [get_infected(graph, infected_idx.tolist(), set(vaccinated_idx.tolist())) for graph in topology_dicts(parents)]
+
+    reached = _reached_pairs(parents, infected_idx, vaccinated_idx, max_levels)
+    assert len(np.unique(reached)) == len(reached)
+    per_topology = len(infected_idx) + np.bincount(reached // num_nodes, minlength=num_topologies)
+    assert per_topology.tolist() == expected
+    assert count_infected(parents, infected_idx, vaccinated_idx)[1].tolist() == expected
+
+
+def test_long_chain_is_finished_by_components():
+    parents = np.tile(np.arange(-1, 19999, dtype=np.int32), (5, 1))
+    parents[:, 10000] = -1
+    total, per_topology = count_infected(parents, [0], [15000])
+    assert per_topology.tolist() == [10000] * 5 and total == 50000
+
+
+def test_forest_scores_match_count_infected():
+    rng = np.random.default_rng(7)
+    parents = deep_parents(400, 30, rng)
+    infected_idx = rng.choice(400, 5, replace=False)
+    forest = build_infected_forest(parents, infected_idx)
+    for num_vaccinated in (0, 1, 40, 395):
+        vaccinated_idx = rng.choice(np.setdiff1d(np.arange(400), infected_idx), num_vaccinated, replace=False)
+        total, per_topology = count_infected_in_forest(forest, vaccinated_idx, 30, 5)
+        expected_total, expected = count_infected(parents, infected_idx, vaccinated_idx)
+        assert total == expected_total and per_topology.tolist() == expected.tolist()
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from scipy.spatial import cKDTree
+
+from LT_generate_waxman_gaussian import (convex_hull_diameter, generate_gaussian_points,
+                                         generate_waxman_graph_gaussian_truncated, load_streamed_edges,
+                                         stream_waxman_edges_truncated, waxman_chunks)
+from lt_graph_io import csr_sources, read_graph
+from lt_weights import is_valid_network
+
+
+def test_chunks_stay_within_the_pair_budget():
+    points, _, _ = generate_gaussian_points(2000, 5, rng=np.random.default_rng(1))
+    cutoff = 0.05 * convex_hull_diameter(points)
+    tree = cKDTree(points)
+    counts = tree.query_ball_point(points, cutoff, return_length=True)
+    chunks = waxman_chunks(points, tree, cutoff, 3000)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(points)
+    assert all(stop == next_start for (_, stop), (next_start, _) in zip(chunks, chunks[1:]))
+    assert all(counts[start:stop].sum() <= 3000 for start, stop in chunks if stop - start > 1)
+
+
+def test_truncated_edges_match_dense_when_every_pair_is_kept(tmp_path):
+    points, _, _ = generate_gaussian_points(500, 3, rng=np.random.default_rng(2))
+    L = convex_hull_diameter(points)
+    # alpha = 1 and a huge beta keep every pair within the cutoff
+    truncated, dense = str(tmp_path / "truncated.bin"), str(tmp_path / "dense.bin")
+    stream_waxman_edges_truncated(points, L, 1.0, 1e9, 0.1 * L, truncated, max_pairs=1000)
+    with pytest.warns(UserWarning, match="every pair is sampled"):
+        num_edges = stream_waxman_edges_truncated(points, L, 1.0, 1e9, L, dense, max_pairs=1000)
+    assert num_edges == len(points) * (len(points) - 1) // 2
+    assert len(np.unique(load_streamed_edges(dense), axis=0)) == num_edges
+
+    # Every pair once, even though the chunks' range queries overlap
+    edges = np.asarray(load_streamed_edges(truncated))
+    assert (edges[:, 0] < edges[:, 1]).all()
+    assert len(np.unique(edges, axis=0)) == len(edges)
+    assert (np.hypot(*(points[edges[:, 0]] - points[edges[:, 1]]).T) <= 0.1 * L).all()
+    assert len(edges) == len(cKDTree(points).query_pairs(0.1 * L, output_type='ndarray'))
+
+
+def test_truncated_generator_writes_a_valid_graph(tmp_path):
+    graphs = []
+    for extension in (".txt", ".ltg"):
+        filename = str(tmp_path / ("graph" + extension))
+        generate_waxman_graph_gaussian_truncated(800, 4, 0.5, 0.05, 0.1, 7, 0.2, output_filename=filename,
+                                                 max_pairs=2000, rng=np.random.default_rng(3))
+        graphs.append(read_graph(filename))
+        assert not (tmp_path / ("graph" + extension + ".pairs")).exists()
+    text, binary = graphs
+
+    sources, targets = csr_sources(binary["offsets"]), np.asarray(binary["targets"])
+    assert len(targets) > 0 and is_valid_network(targets, binary["weights"], 800)
+    # Both directions of every edge, and nothing else
+    forward = np.unique(np.column_stack([sources, targets]), axis=0)
+    assert len(forward) == len(targets)
+    assert np.array_equal(forward, np.unique(np.column_stack([targets, sources]), axis=0))
+    assert binary["num_instances"] == 7 and binary["num_vaccines"] == 160 and len(binary["infected"]) == 80
+
+    # The same seed gives the same graph in both formats (the text reader drops the edges
+    # whose weight was floored to 0)
+    for key in ("nodes", "infected"):
+        assert np.array_equal(text[key], binary[key])
+    kept = np.asarray(binary["weights"]) != 0
+    assert np.array_equal(csr_sources(text["offsets"]), sources[kept])
+    assert np.array_equal(text["targets"], targets[kept])
+    assert np.allclose(text["weights"], binary["weights"][kept], atol=1e-5)
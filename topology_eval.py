@@ -0,0 +1,96 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+# Every live-edge topology is an in-forest (each node has at most one parent), so the
+# infected (topology, node) pairs are the ones reached from an initially infected node
+# along live edges without entering a vaccinated node: the BFS the LP scripts used to run
+# per topology (get_infected, kept as the reference in bench_topology_eval.py). The
+# evaluator walks a block of topologies level by level from all of their seeds at once:
+# the live edges into unvaccinated non-seed pairs are grouped by parent pair in one linear
+# pass (scipy's counting-sort COO to CSR conversion), and every level gathers the children
+# of the previous one. A pair has a single parent, so it is reached at most once and no
+# visited set is needed; a cycle can only be entered through a seed, whose incoming edge
+# is dropped. Every level costs a few NumPy calls however small it is, so a walk that is
+# still going after max_levels levels (long chains) is finished by one connected
+# components pass over the same edges instead: each component has at most one pair
+# without a live edge, and it is infected iff that pair is a seed. Pointer jumping would
+# need log2(depth) passes over the unresolved pairs for the same answer.
+
+
+def _reached_pairs(parents, infected_idx, vaccinated_idx=(), max_levels=None):
+    # Flat indices (row * N + node) of the infected non-seed pairs of a block of parent
+    # rows; max_levels defaults to the depth at which the per-level overhead of the walk
+    # outweighs a connected components pass over the block
+    parents = np.asarray(parents)
+    num_topologies, num_nodes = parents.shape
+    max_levels = max(64, parents.size >> 12) if max_levels is None else max_levels
+    index_dtype = np.int32 if parents.size < 2**31 else np.int64
+    seeds = np.unique(np.asarray(infected_idx, dtype=np.int64))
+    blocked = np.zeros(num_nodes, dtype=bool)
+    blocked[np.asarray(vaccinated_idx, dtype=np.int64)] = True
+    blocked[seeds] = True
+
+    children = np.flatnonzero((parents >= 0) & ~blocked).astype(index_dtype)
+    pointers = (parents + np.arange(0, parents.size, num_nodes, dtype=index_dtype)[:, None]).astype(index_dtype, copy=False)
+    by_parent = sp.coo_matrix((np.ones(len(children), dtype=np.int8), (pointers.ravel().take(children), children)),
+                              shape=(parents.size, parents.size)).tocsr()
+    offsets, grouped = by_parent.indptr, by_parent.indices
+
+    seed_pairs = (np.arange(0, parents.size, num_nodes, dtype=index_dtype)[:, None] + seeds.astype(index_dtype)).ravel()
+    frontier = seed_pairs
+    levels = [np.empty(0, dtype=grouped.dtype)]
+    while len(frontier):
+        if len(levels) > max_levels:
+            _, labels = connected_components(by_parent, directed=False)
+            infected = np.zeros(labels.max() + 1, dtype=bool)
+            infected[labels.take(seed_pairs)] = True
+            reached = infected.take(labels)
+            reached[seed_pairs] = False
+            return np.flatnonzero(reached)
+        starts = offsets.take(frontier)
+        counts = offsets.take(frontier + 1) - starts
+        # Position of every child: its parent's start plus its rank among the siblings
+        ends = np.cumsum(counts)
+        positions = np.repeat(starts - ends + counts, counts) + np.arange(ends[-1], dtype=starts.dtype)
+        frontier = grouped.take(positions)
+        levels.append(frontier)
+    return np.concatenate(levels)
+
+def infected_mask(parents, infected_idx, vaccinated_idx=()):
+    # Boolean (T, N) matrix of the infected (topology, node) pairs. infected_idx and
+    # vaccinated_idx are dense node indices. Initially infected nodes always count as
+    # infected, as in get_infected; nodes on a cycle without infected nodes are never
+    # reached from a seed and stay uninfected.
+    parents = np.asarray(parents)
+    mask = np.zeros(parents.shape, dtype=bool)
+    mask.ravel()[_reached_pairs(parents, infected_idx, vaccinated_idx)] = True
+    mask[:, np.asarray(infected_idx, dtype=np.int64)] = True
+    return mask
+
+def count_infected(parents, infected_idx, vaccinated_idx=(), block_size=None):
+    # Returns (total, per topology counts) of infected nodes over all topologies, the
+    # vectorized counterpart of summing get_infected over every topology. Topologies are
+    # evaluated block_size at a time to bound the temporary arrays.
+    num_topologies, num_nodes = parents.shape
+    block_size = max(1, (1 << 22) // max(num_nodes, 1)) if block_size is None else block_size
+    num_seeds = len(np.unique(np.asarray(infected_idx, dtype=np.int64)))
+    per_topology = np.zeros(num_topologies, dtype=np.int64)
+    for start in range(0, num_topologies, block_size):
+        stop = min(start + block_size, num_topologies)
+        reached = _reached_pairs(parents[start:stop], infected_idx, vaccinated_idx)
+        per_topology[start:stop] = num_seeds + np.bincount(reached // num_nodes, minlength=stop - start)
+    return int(per_topology.sum()), per_topology
+
+def infected_pairs(parents, infected_idx, vaccinated_idx=(), block_size=None):
+    # Sorted flat indices (topology * N + node) of the infected pairs whose node is not
+    # initially infected, block_size topologies at a time
+    num_topologies, num_nodes = parents.shape
+    block_size = max(1, (1 << 22) // max(num_nodes, 1)) if block_size is None else block_size
+    pairs = [np.empty(0, dtype=np.int64)]
+    for start in range(0, num_topologies, block_size):
+        stop = min(start + block_size, num_topologies)
+        mask = np.zeros((stop - start) * num_nodes, dtype=bool)
+        mask[_reached_pairs(parents[start:stop], infected_idx, vaccinated_idx)] = True
+        pairs.append(np.flatnonzero(mask) + start * num_nodes)
+    return np.concatenate(pairs)
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from topology_eval import count_infected
+
+# Worker side: the parent matrix is attached once per process, in the initializer
+_worker = {}
+
+
+def _attach(shm_name, shape, infected_idx):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm
+    _worker["parents"] = np.ndarray(shape, dtype=np.int32, buffer=shm.buf)
+    _worker["infected_idx"] = infected_idx
+
+def _count_shard(task):
+    # Per topology counts of every vaccination set on topologies [start, stop)
+    start, stop, vaccination_sets = task
+    parents = _worker["parents"][start:stop]
+    return start, [count_infected(parents, _worker["infected_idx"], vaccinated)[1] for vaccinated in vaccination_sets]
+
+def start_evaluator_pool(parents, infected_idx, max_workers=None, shards_per_worker=4):
+    # Copies the (T, N) parent matrix into shared memory once and starts workers that
+    # attach to it; calls then only send vaccination sets and receive counts
+    parents = np.asarray(parents)
+    max_workers = os.cpu_count() if max_workers is None else max_workers
+    shm = shared_memory.SharedMemory(create=True, size=max(parents.nbytes, 1))
+    np.ndarray(parents.shape, dtype=np.int32, buffer=shm.buf)[:] = parents
+
+    num_topologies = parents.shape[0]
+    num_shards = max(1, min(num_topologies, max_workers * shards_per_worker))
+    bounds = np.linspace(0, num_topologies, num_shards + 1).astype(int)
+    # ILP.py and the LP scripts prompt for input at import time, so the workers are
+    # forked rather than spawned (a spawned worker re-imports the main module)
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else None)
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=_attach,
+                                   initargs=(shm.name, parents.shape, np.asarray(infected_idx, dtype=np.int64)))
+    return {"executor": executor, "shm": shm, "shape": parents.shape,
+            "shards": [(int(start), int(stop)) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]}
+
+def close_evaluator_pool(pool):
+    pool["executor"].shutdown()
+    pool["shm"].close()
+    pool["shm"].unlink()
+
+@contextmanager
+def evaluator_pool(parents, infected_idx, max_workers=None):
+    pool = start_evaluator_pool(parents, infected_idx, max_workers)
+    try:
+        yield pool
+    finally:
+        close_evaluator_pool(pool)
+
+def pool_count_infected(pool, vaccination_sets):
+    # Returns (totals, per topology counts) for a list of vaccination sets (dense
+    # indices): totals[s] is the number of infected (topology, node) pairs under set s,
+    # per_topology[s] its counts per topology
+    vaccination_sets = [np.asarray(sorted(vaccinated), dtype=np.int64) for vaccinated in vaccination_sets]
+    per_topology = np.zeros((len(vaccination_sets), pool["shape"][0]), dtype=np.int64)
+    tasks = [(start, stop, vaccination_sets) for start, stop in pool["shards"]]
+    for start, counts in pool["executor"].map(_count_shard, tasks):
+        for index, shard_counts in enumerate(counts):
+            per_topology[index, start:start + len(shard_counts)] = shard_counts
+    return per_topology.sum(axis=1), per_topology
@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+# A topology store keeps T live-edge instances of an N node graph as one row-major
+# int32 (T, N) matrix of parent indices (-1 for no parent) in <prefix>.parents.bin,
+# next to <prefix>.meta.npz with the node labels (sorted, position i is dense index i)
+# and the labels of the initially infected nodes. Opening a store memory-maps the
+# matrix, so it takes constant time and the matrix is paged in only when used.
+PARENTS_SUFFIX = ".parents.bin"
+META_SUFFIX = ".meta.npz"
+
+
+def store_prefix(filename):
+    for suffix in (PARENTS_SUFFIX, META_SUFFIX, ".json"):
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return filename
+
+def node_indices(nodes, labels):
+    # Dense indices of node labels (nodes is sorted)
+    labels = np.asarray(list(labels) if isinstance(labels, (set, frozenset)) else labels, dtype=np.int64)
+    indices = np.searchsorted(nodes, labels)
+    if np.any(indices >= len(nodes)) or np.any(nodes[np.minimum(indices, len(nodes) - 1)] != labels):
+        raise ValueError("Some labels are not nodes of the graph")
+    return indices
+
+def is_topology_store(filename):
+    prefix = store_prefix(filename)
+    return os.path.exists(prefix + PARENTS_SUFFIX) and os.path.exists(prefix + META_SUFFIX)
+
+def write_topology_store(prefix, parents, nodes, infected):
+    nodes = np.asarray(nodes, dtype=np.int64)
+    parents = np.ascontiguousarray(parents, dtype=np.int32)
+    if parents.ndim != 2 or parents.shape[1] != len(nodes):
+        raise ValueError(f"parents must have shape (instances, {len(nodes)}), got {parents.shape}")
+    parents.tofile(prefix + PARENTS_SUFFIX)
+    # The metadata is written last so a store without it is never opened
+    np.savez(prefix + META_SUFFIX, nodes=nodes, infected=np.asarray(infected, dtype=np.int64))
+
+def open_topology_store(filename):
+    prefix = store_prefix(filename)
+    with np.load(prefix + META_SUFFIX) as meta:
+        nodes, infected = meta["nodes"], meta["infected"]
+    num_instances = os.path.getsize(prefix + PARENTS_SUFFIX) // (4 * max(len(nodes), 1))
+    if num_instances == 0:
+        parents = np.empty((0, len(nodes)), dtype=np.int32)
+    else:
+        parents = np.memmap(prefix + PARENTS_SUFFIX, dtype=np.int32, mode='r', shape=(num_instances, len(nodes)))
+    return {"parents": parents, "nodes": nodes, "infected": infected}
+
+def json_instance_parents(instance, nodes):
+    # Parent row of one instance of saveInstancesToJson ({"edges": [[u, v], ...]}, string labels)
+    row = np.full(len(nodes), -1, dtype=np.int32)
+    edges = np.array(instance.get("edges") or [], dtype=np.int64).reshape(-1, 2)
+    if len(edges):
+        indices = node_indices(nodes, edges)
+        row[indices[:, 1]] = indices[:, 0]
+    return row
+
+def iter_json_instances(json_filename, chunk_size=1 << 20):
+    # Yields the instances of a saveInstancesToJson file ([{...}, {...}, ...]) one at a
+    # time. Each instance is decoded as soon as its closing brace has been read, so only
+    # the instance being decoded is held in memory, never the whole document.
+    decoder = json.JSONDecoder()
+    with open(json_filename, 'r') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if buffer.startswith("null"):
+            # nlohmann::json writes an empty array of instances as null
+            return
+        if not buffer.startswith("["):
+            raise ValueError(f"{json_filename} is not a JSON array of instances")
+        position, read_size, eof = 1, chunk_size, False
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                instance, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The instance is not complete yet; read more, twice as much each time an
+                # instance outgrows the buffer so large instances are decoded O(1) times
+                buffer = buffer[position:]
+                position = 0
+                chunk = f.read(read_size)
+                eof = not chunk
+                buffer += chunk
+                read_size *= 2
+                continue
+            yield instance
+            position, read_size = end, chunk_size
+
+def iter_json_parents(json_filename, nodes):
+    # Parent rows of a saveInstancesToJson file, one instance at a time
+    nodes = np.asarray(nodes, dtype=np.int64)
+    for instance in iter_json_instances(json_filename):
+        yield json_instance_parents(instance, nodes)
+
+def json_to_topology_store(json_filename, prefix, nodes, infected):
+    # Streams the instances into the parent matrix row by row, so peak memory is one
+    # instance however many instances the file has
+    nodes = np.asarray(nodes, dtype=np.int64)
+    with open(prefix + PARENTS_SUFFIX, 'wb') as f:
+        for row in iter_json_parents(json_filename, nodes):
+            row.tofile(f)
+    np.savez(prefix + META_SUFFIX, nodes=nodes, infected=np.asarray(infected, dtype=np.int64))
+
+def load_topologies(filename, nodes, infected):
+    # Opens a topology store, converting a deterministicInstances_*.json file of the C++
+    # programs into one next to it the first time
+    prefix = store_prefix(filename)
+    if filename.endswith(".json") and (not is_topology_store(prefix)
+                                       or os.path.getmtime(filename) > os.path.getmtime(prefix + META_SUFFIX)):
+        json_to_topology_store(filename, prefix, nodes, infected)
+    store = open_topology_store(prefix)
+    if not np.array_equal(store["nodes"], nodes):
+        raise ValueError(f"The topologies in {prefix} belong to a different graph")
+    return store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "from-json":
+        print(f"Usage: {sys.argv[0]} from-json <graph> <deterministicInstances json>")
+        sys.exit(1)
+    from lt_graph_io import read_graph
+
+    graph_data = read_graph(sys.argv[2])
+    prefix = store_prefix(sys.argv[3])
+    json_to_topology_store(sys.argv[3], prefix, graph_data["nodes"], graph_data["infected"])
+    print(f"{len(open_topology_store(prefix)['parents'])} topologies, output in {prefix}{PARENTS_SUFFIX}")